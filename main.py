@@ -9,6 +9,9 @@ from streamlit_authenticator.utilities import (CredentialsError,
                                                RegisterError,
                                                ResetError,
                                                UpdateError)
+from utils.outbox import start_delivery
+from utils.perf import span, timed
+from utils.prefetch import prefetch
 
 # Web appearance configuration
 st.set_page_config(page_title="AC/BC Visualize", page_icon='🧪',
@@ -85,6 +88,7 @@ def handle_forgotten_password():
         handle_error(e, "Error in recovering password")
 
 
+@timed('save_config')
 def save_config():
     with open('.streamlit/config.yaml', 'w', encoding='utf-8') as file:
         yaml.dump(config, file, default_flow_style=False)
@@ -137,9 +141,12 @@ def app_ini():
             st.Page(account_setting_page, title="Account Settings"),
         ],
     }
+    if "Administrator" in (st.session_state.get("roles") or []):
+        pages["Admin"] = [st.Page("tabs/performance.py", title="Performance")]
 
     pg = st.navigation(pages)
-    pg.run()
+    with span('rerun', page=pg.title):
+        pg.run()
 
 
 # Login structure
@@ -186,5 +193,10 @@ if st.session_state["authentication_status"]:
         authenticator.logout()
         save_config()
 
+    # Warm the shared caches while the first page renders
+    prefetch()
+    # Deliver the submissions still in the outbox, e.g. from before a restart
+    start_delivery()
+
     ## The function for the app
     app_ini()
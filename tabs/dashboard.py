@@ -1,71 +1,26 @@
 import streamlit as st
-import requests
 import pandas as pd
-import io
+import numpy as np
 import plotly.graph_objects as go
 import xml.etree.ElementTree as ET
-
-# Repository details
-repo_url = st.secrets['forgejo']['repo_url']
-api_base = st.secrets['forgejo']['api_base']
-branch = "main"  # Adjust if the branch is different
-auth = (st.secrets['forgejo']['username'], st.secrets['forgejo']['password'])
-owner = st.secrets['forgejo']['owner']
-repo = st.secrets['forgejo']['repo']
-
+from utils.cube import DIMENSIONS as CUBE_DIMENSIONS, MEASURES as CUBE_MEASURES, aggregation_cube
+from utils.fileindex import get_file_index, list_files
+from utils.inventory import get_master, get_ucd_database, refresh
+from utils.library import METHODS as MATCH_METHODS, spectral_library
+from utils.metrics import derived_metrics
+from utils.peaks import peak_index
+from utils.perf import span
+from utils.preprocess import BASELINES, NORMALIZATIONS, pipeline_key, preprocessed_spectra
+from utils.samplestore import sample_store
+from utils.search import search_index
+from utils.similarity import FEATURES as SIMILARITY_FEATURES, similarity_index
+from utils.spectra import downsample_frame, minmax_downsample
+
+CHART_WIDTH = 800  # Pixels, also sets how many points a spectrum is downsampled to
 
 ###### Function section begins here #######
 
-@st.cache_data
-def fetch_csv(file_path, header=0):
-    """
-    Function to fetch csv spreadsheets
-
-    Parameters:
-        -file_path(str): The path to the subfolder (e.g., 'master.csv').
-        -header(int or None): Indicate the index of the csv headers. Default = 0
-    Returns:
-        -pandas.dataframe: The csv file as a Pandas DataFrame
-    """
-    raw_url = f"{repo_url}/raw/{branch}/{file_path}"
-    try:
-        response = requests.get(raw_url, auth=auth)
-        if response.status_code == 200:
-            return pd.read_csv(io.StringIO(response.content.decode('utf-8')), header=header)
-        else:
-            st.error(f"Failed to fetch {file_path}. Status code: {response.status_code}")
-            return None
-    except Exception as e:
-        st.error(f"Error: {e}")
-        return None
-
-
-def list_files(subfolder_path):
-    """
-    Lists all files in the specified subfolder of the Forgejo repository.
-
-    Parameters:
-    - subfolder_path (str): The path to the subfolder (e.g., 'acbc_database').
-
-    Returns:
-    - list: A list of file paths (relative to the repository root) in the subfolder.
-    """
-    url = f"{api_base}/repos/{owner}/{repo}/contents/{subfolder_path}?ref={branch}"
-    try:
-        response = requests.get(url, auth=auth)
-        if response.status_code == 200:
-            contents = response.json()
-            # st.write(contents) #Uncomment to see the
-            return [item['name'] for item in contents if item['type'] == 'file']
-        else:
-            st.error(f"Failed to list files. Status code: {response.status_code}")
-            return []
-    except Exception as e:
-        st.error(f"Error listing files: {e}")
-        return []
-
-
-def plot_line_chart(data, title="Line Chart", xaxis_title="X Axis", yaxis_title="Y Axis"):
+def plot_line_chart(data, title="Line Chart", xaxis_title="X Axis", yaxis_title="Y Axis", max_points=None):
     """
     Create a simple line chart using Plotly.
 
@@ -74,10 +29,13 @@ def plot_line_chart(data, title="Line Chart", xaxis_title="X Axis", yaxis_title=
     - title (str): The title of the chart.
     - xaxis_title (str): The label for the x-axis.
     - yaxis_title (str): The label for the y-axis.
+    - max_points (int): Downsample larger data to this many points. Default = None, two points per pixel
 
     Returns:
     - go.Figure: A Plotly figure object representing the line chart.
     """
+    with span('spectra.downsample'):
+        data = downsample_frame(data, max_points or 2 * CHART_WIDTH)
     fig = go.Figure(data=go.Scatter(
         x=data.iloc[:, 0],
         y=data.iloc[:, 1],
@@ -92,7 +50,7 @@ def plot_line_chart(data, title="Line Chart", xaxis_title="X Axis", yaxis_title=
         xaxis_title=xaxis_title,
         yaxis_title=yaxis_title,
         autosize=False,
-        width=800,
+        width=CHART_WIDTH,
         height=500,
         margin=dict(l=50, r=50, b=100, t=100, pad=4)
     )
@@ -100,6 +58,68 @@ def plot_line_chart(data, title="Line Chart", xaxis_title="X Axis", yaxis_title=
     return fig
 
 
+def plot_overlay_chart(grid, values, names, title="Overlay", xaxis_title="X Axis", yaxis_title="Y Axis"):
+    """
+    Overlay several spectra sampled on a shared grid in one Plotly figure.
+
+    Parameters:
+    - grid (np.ndarray): The shared x values.
+    - values (np.ndarray): One row of y values per spectrum.
+    - names (list): The legend name of each row.
+    - title (str): The title of the chart.
+    - xaxis_title (str): The label for the x-axis.
+    - yaxis_title (str): The label for the y-axis.
+
+    Returns:
+    - go.Figure: A Plotly figure object with one line per spectrum.
+    """
+    fig = go.Figure()
+    for name, row in zip(names, values):
+        keep = minmax_downsample(grid, row, 2 * CHART_WIDTH)
+        fig.add_trace(go.Scatter(x=grid[keep], y=row[keep], mode='lines', name=name))
+
+    fig.update_layout(
+        title=title,
+        xaxis_title=xaxis_title,
+        yaxis_title=yaxis_title,
+        autosize=False,
+        width=CHART_WIDTH,
+        height=500,
+        margin=dict(l=50, r=50, b=100, t=100, pad=4)
+    )
+
+    return fig
+
+
+def filter_sort(df, search=None, sort_by=None, ascending=True):
+    """
+    Rows of a dataframe containing a text, optionally sorted by one column.
+
+    Parameters:
+    - df (df): dataframe with the data
+    - search (str): Case-insensitive text to look for in every text column. Default = None, keep all rows
+    - sort_by (str): Column to sort by. Default = None, keep the order
+    - ascending (bool): Sort order. Default = True
+
+    Returns:
+    - df: The matching rows.
+    """
+    if search:
+        mask = pd.Series(False, index=df.index)
+        for column in df.columns:
+            values = df[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                # Search the few categories, then map the result to the rows through their codes
+                hits = values.cat.categories.astype(str).str.contains(search, case=False, regex=False)
+                mask |= pd.Series(np.append(hits, False)[values.cat.codes], index=df.index)
+            elif pd.api.types.is_string_dtype(values) or pd.api.types.is_object_dtype(values):
+                mask |= values.astype('string').str.contains(search, case=False, regex=False).fillna(False)
+        df = df[mask]
+    if sort_by is not None:
+        df = df.sort_values(sort_by, ascending=ascending, na_position='last')
+    return df
+
+
 ###### The Dashboard page begins here #######
 
 st.title("AC/BC Visualization 🦦")
@@ -107,20 +127,10 @@ st.header(f"Welcome back {st.session_state['name']}")
 st.caption("Scroll down to see all the interactives and downloadables graphics")
 
 ### Loading Inventory from Database
+# Each section below is a fragment: its widgets rerun only that section, not the whole page
 with st.status('Connecting to ACBC-REPO...'):
-    if 'master' in st.session_state:
-        master = st.session_state['master']
-    else:
-        master = fetch_csv("acbc_database/master.csv")
-        master.dropna(axis=0, how='all', inplace=True)
-        st.session_state['master'] = master
-
-    if 'UCD_Database' in st.session_state:
-        UCD_Database = st.session_state['UCD_Database']
-    else:
-        UCD_Database = fetch_csv("uc_davis_database/UC_Davis_Biochar_Database.csv")
-        UCD_Database.dropna(axis=0, how='all', inplace=True)
-        st.session_state['UCD_Database'] = UCD_Database
+    # Shared by every session and reloaded only when the branch head moves
+    master = get_master()
 
     col_reload = st.columns([1, 0.1])
     with col_reload[0]:
@@ -128,182 +138,424 @@ with st.status('Connecting to ACBC-REPO...'):
     with col_reload[1]:
         with st.spinner('Reloading'):
             if st.button('🔄️', key='file_refresh'):
-                fetch_csv.clear()
-                master = fetch_csv("acbc_database/master.csv")
-                st.session_state['master'] = master
+                refresh()
+                master = get_master()
         # This is to check if the reload button is working
         #         st.session_state['reload_count'] = st.session_state.get('reload_count', 0) + 1
         #
         # st.write(f"Reload count: {st.session_state.get('reload_count', 0)}")
 
 ### Displaying the inventory
-st.write('''
-### Master Biochar Inventory 📖
-''')
-st.caption('This is the Biochar Inventory. You can sort, search, expand and download')
-st.dataframe(master, use_container_width=True)
+@st.fragment
+def inventory_table(master):
+    st.write('''
+    ### Master Biochar Inventory 📖
+    ''')
+    st.caption('This is the Biochar Inventory. You can sort, search, expand and download')
+    query = st.text_input('Search', placeholder='e.g. hold > 120 min AND crab', key='inventory_search',
+                          help='Words (prefixes work) or comparisons on rate, peak, hold, temp, bet, capacity, '
+                               'ph and yield, combined with AND / OR. Protocol values come from ProcessDetails.')
+    if query:
+        with span('search'):
+            results = search_index(master).search(query)
+        st.caption(f"{len(results)} of {len(master)} samples match")
+        st.dataframe(results, use_container_width=True)
+    else:
+        st.dataframe(master, use_container_width=True)
+
+
+inventory_table(master)
+
+
+@st.fragment
+def ucd_section():
+    with st.expander("See the UC Davis Database"):
+        st.write("Visit UC Davis Database 👇")
+        st.link_button("UC Davis Database", "https://biochar.ucdavis.edu/")
+        # Downloaded only once somebody asks for it, and only one page is sent to the browser
+        if st.toggle("Load the UC Davis Database", key='ucd_load'):
+            UCD_Database = get_ucd_database()
+            if UCD_Database is not None:
+                ucd_col1, ucd_col2, ucd_col3, ucd_col4 = st.columns((3, 2, 1, 1))
+                ucd_search = ucd_col1.text_input("Filter rows", placeholder='Text contained in any column', key='ucd_search')
+                ucd_sort = ucd_col2.selectbox("Sort by", options=UCD_Database.columns, index=None, key='ucd_sort')
+                ucd_ascending = ucd_col3.radio("Order", options=['Asc', 'Desc'], horizontal=True, key='ucd_order') == 'Asc'
+                ucd_page_size = ucd_col4.selectbox("Rows", options=[25, 50, 100, 250], key='ucd_page_size')
+                ucd_view = filter_sort(UCD_Database, ucd_search, ucd_sort, ucd_ascending)
+                ucd_pages = max(-(-len(ucd_view) // ucd_page_size), 1)
+                ucd_page = st.number_input(f"Page (of {ucd_pages})", min_value=1, max_value=ucd_pages, step=1,
+                                           key='ucd_page')
+                st.dataframe(ucd_view.iloc[(ucd_page - 1) * ucd_page_size:ucd_page * ucd_page_size])
+                st.caption(f"{len(ucd_view)} of {len(UCD_Database)} rows match")
+
+
+ucd_section()
 
-with st.expander("See the UC Davis Database"):
-    st.write("Visit UC Davis Database 👇")
-    st.link_button("UC Davis Database", "https://biochar.ucdavis.edu/")
-    st.dataframe(UCD_Database)
 
 ### Pulling Data from the inventory
-with st.form("pull_data"):
+@st.fragment
+def pull_data_section(master):
     st.write('''
         ### Visualize information from the selected samples 👇 
         ''')
+    store = sample_store(master)
+    with st.expander("Narrow down the sample list"):
+        flt1, flt2, flt3, flt4 = st.columns((1, 1, 1, 1))
+        filters = {
+            'Feedstock': flt1.multiselect('Feedstock', options=sorted(store.indexes['Feedstock']), key='flt_feedstock'),
+            'GroupLab': flt2.multiselect('GroupLab', options=sorted(store.indexes['GroupLab']), key='flt_grouplab'),
+            'PyrolysisType': flt3.multiselect('PyrolysisType', options=sorted(store.indexes['PyrolysisType']),
+                                              key='flt_pyrolysis'),
+        }
+        temp_bounds = (float(store.temp_sorted[0]), float(store.temp_sorted[-1])) if len(store.temp_sorted) else (0.0, 1000.0)
+        if temp_bounds[0] < temp_bounds[1]:
+            temp_range = flt4.slider('Temp(C)', *temp_bounds, value=temp_bounds, key='flt_temp')
+        else:  # A single temperature leaves nothing to narrow down (and st.slider rejects min == max)
+            temp_range = temp_bounds
+    sample_options = store.query(['ShortName'], temp_range=None if temp_range == temp_bounds else temp_range,
+                                 **{column: values for column, values in filters.items() if values})['ShortName']
+
+    with st.form("pull_data"):
+
+        par1, par2 = st.columns((1, 1))
+        ### Sample and param
+        with par1:
+            choice = st.multiselect('Select sample(s)', options=sample_options, placeholder='ShortName',
+                                    help='Select the samples you wish to compare')
+        with par2:
+            param = st.selectbox('Parameter', options=['Capacity(mmol/g)', 'BET(m2/g)', 'pH', 'Yield(%)', 'PoreSize(nm)',
+                                                       'PoreVolume(cm3/g)', 'Density', 'Hydrophobicity'],
+                                 help='Select one of the parameters',
+                                 placeholder='Parameter')
+        submitted = st.form_submit_button("Visualize")
+        st.markdown('''---''')
+        if submitted:
+            selected = store.rows(choice)  # Looked up once, in the order of the selection
+            col1, col2, col3 = st.columns((2, 2, 4))
+            col4, col5 = st.columns((1, 1))
+
+            ### Selected samples sortable dataframe
+            with col1:
+                st.dataframe(selected[['ShortName', 'LongName', param]],
+                             use_container_width=True)
+            ### Selected parameter description
+            with col2:
+                st.write(f'''
+                    ### **{param} Method**
+                    Some description of the methodology used to record this data.
+                    Step-by-step:
+                    1. This is step 1
+                    2. This is step 2
+                    ''')
+            ### The sample by selected parameter bar graph
+            with col3:
+                fig = go.Figure(data=[
+                    go.Bar(name='Sample Data', x=selected['ShortName'], y=selected[param])
+                ])
+
+                fig.update_layout(
+                    title=f'Sample by {param}',
+                    xaxis_title='Sample',
+                    yaxis_title=f'{param}',
+                    template='plotly_white'  # Optional: set the background to white for better readability
+                )
+                st.plotly_chart(fig, use_container_width=True)
+            ### The samples elemental analysis stacked bar graph
+            with col4:
+                df = selected[['ShortName', '%C', '%H', '%N', '%O']]
+                fig = go.Figure()
+
+                for element in ['%C', '%H', '%N', '%O']:
+                    fig.add_trace(go.Bar(
+                        x=df['ShortName'],
+                        y=df[element],
+                        name=element,
+                        text=df[element].apply(lambda x: f'{x:.2f}%'),
+                        textposition='auto'
+                    ))
+
+                # Update layout
+                fig.update_layout(
+                    barmode='stack',
+                    title='Elemental Analysis Composition',
+                    xaxis_title='Sample',
+                    yaxis_title='Percentage (%)',
+                )
+                st.plotly_chart(fig, use_container_width=True)
 
-    par1, par2 = st.columns((1, 1))
-    ### Sample and param
-    with par1:
-        choice = st.multiselect('Select sample(s)', options=master['ShortName'], placeholder='ShortName',
-                                help='Select the samples you wish to compare')
-    with par2:
-        param = st.selectbox('Parameter', options=['Capacity(mmol/g)', 'BET(m2/g)', 'pH', 'Yield (%)', 'PoreSize(nm)',
-                                                   'PoreVolume(cm3/g)', 'Density ', 'Hydrophobicity '],
-                             help='Select one of the parameters',
-                             placeholder='Parameter')
-    submitted = st.form_submit_button("Visualize")
-    st.markdown('''---''')
-    if submitted:
-        col1, col2, col3 = st.columns((2, 2, 4))
-        col4, col5 = st.columns((1, 1))
-
-        ### Selected samples sortable dataframe
-        with col1:
-            st.dataframe(master[['ShortName', 'LongName', param]][master['ShortName'].isin(choice)],
-                         use_container_width=True)
-        ### Selected parameter description
-        with col2:
-            st.write(f'''
-                ### **{param} Method**
-                Some description of the methodology used to record this data.
-                Step-by-step:
-                1. This is step 1
-                2. This is step 2
-                ''')
-        ### The sample by selected parameter bar graph
-        with col3:
-            fig = go.Figure(data=[
-                go.Bar(name='Sample Data', x=choice, y=master[param][master['ShortName'].isin(choice)])
-            ])
 
+pull_data_section(master)
+
+
+### Adsorption correlation scatter 3D plot
+@st.fragment
+def adsorption_section(master):
+    with st.container(border=False):
+        st.write(r'''
+        ---
+        ### Adsorption vs SSA vs $(O+N)/C$  
+        ''')
+
+        with span('dashboard.ad_df'):
+            metrics = derived_metrics(master)
+            ad_df = metrics.loc[metrics['Capacity(mmol/g)'].notna(),
+                                ['ShortName', 'LongName', 'Capacity(mmol/g)', 'BET(m2/g)', '(O+N)/C']]
+            labels = metrics.loc[ad_df.index, 'label']
+        ads_col1, ads_col2 = st.columns((1, 2))
+        with ads_col1:
+            st.dataframe(ad_df)
+        with ads_col2, span('plotly.scatter3d'):
+            fig = go.Figure(data=[go.Scatter3d(
+                x=ad_df['(O+N)/C'],
+                y=ad_df['BET(m2/g)'],
+                z=ad_df['Capacity(mmol/g)'],
+                mode='markers',
+                marker=dict(
+                    size=5,
+                    color=ad_df['Capacity(mmol/g)'],  # Color by z values
+                    colorscale='Viridis',
+                    opacity=0.8),
+                text=labels,  # Add labels for hover
+                hoverinfo='text'  # Display only the text on hover
+
+            )])
+
+            # Customize layout
             fig.update_layout(
-                title=f'Sample by {param}',
-                xaxis_title='Sample',
-                yaxis_title=f'{param}',
-                template='plotly_white'  # Optional: set the background to white for better readability
-            )
-            st.plotly_chart(fig, use_container_width=True)
-        ### The samples elemental analysis stacked bar graph
-        with col4:
-            df = master[['ShortName', '%C', '%H', '%N', '%O']][master['ShortName'].isin(choice)]
-            fig = go.Figure()
-
-            for element in ['%C', '%H', '%N', '%O']:
-                fig.add_trace(go.Bar(
-                    x=df['ShortName'],
-                    y=df[element],
-                    name=element,
-                    text=df[element].apply(lambda x: f'{x:.2f}%'),
-                    textposition='auto'
-                ))
-
-            # Update layout
-            fig.update_layout(
-                barmode='stack',
-                title='Elemental Analysis Composition',
-                xaxis_title='Sample',
-                yaxis_title='Percentage (%)',
+                paper_bgcolor="rgba(230, 230, 230, 0.8)",
+                width=800,
+                height=800,
+                scene=dict(
+                    xaxis=dict(
+                        title='(N+O)/C',
+                        autorange=True
+                    ),
+                    yaxis=dict(
+                        title='SSA(m^2/mg)',
+                        autorange=True
+                    ),
+                    zaxis=dict(
+                        title='Adsorption (mg/g)',
+                        autorange=True
+                    )
+                )
             )
+
+            # 3D scatter plot
             st.plotly_chart(fig, use_container_width=True)
 
-### Adsorption correlation scatter 3D plot
-with st.container(border=False):
+
+adsorption_section(master)
+
+
+### Van Krevelen diagram
+@st.fragment
+def van_krevelen_section(master):
     st.write(r'''
     ---
-    ### Adsorption vs SSA vs $(O+N)/C$  
+    ### Van Krevelen diagram: $H/C$ vs $O/C$
     ''')
+    vk_color = st.radio('Color by', options=['Feedstock', 'PyrolysisType'], horizontal=True, key='vk_color')
+    metrics = derived_metrics(master)
+    vk_df = metrics[metrics['H/C'].notna() & metrics['O/C'].notna()]
+    with span('plotly.van_krevelen'):
+        fig = go.Figure()
+        for group, group_df in vk_df.groupby(vk_df[vk_color].astype(str)):
+            fig.add_trace(go.Scatter(
+                x=group_df['O/C'],
+                y=group_df['H/C'],
+                mode='markers',
+                name=group,
+                text=group_df['vk_label'],
+                hoverinfo='text'
+            ))
 
-    ad_df = master.loc[:, ['ShortName', 'LongName', 'Capacity(mmol/g)', 'BET(m2/g)']]
-    ad_df['(O+N)/C'] = ((master['%O'] + master['%N']) / master['%C'])
-    ad_df.dropna(axis=0, subset=['Capacity(mmol/g)'], inplace=True)
-
-    labels = [(f"{ad_df.iloc[i, 0]}: ({ad_df['Capacity(mmol/g)'].iloc[i]:.2f},"
-               f"{ad_df['BET(m2/g)'].iloc[i]:.2f},"
-               f"{ad_df['(O+N)/C'].iloc[i]:.2f})") for i in range(len(ad_df))]
-    ads_col1, ads_col2 = st.columns((1, 2))
-    with ads_col1:
-        st.dataframe(ad_df)
-    with ads_col2:
-        fig = go.Figure(data=[go.Scatter3d(
-            x=ad_df['(O+N)/C'],
-            y=ad_df['BET(m2/g)'],
-            z=ad_df['Capacity(mmol/g)'],
-            mode='markers',
-            marker=dict(
-                size=5,
-                color=ad_df['Capacity(mmol/g)'],  # Color by z values
-                colorscale='Viridis',
-                opacity=0.8),
-            text=labels,  # Add labels for hover
-            hoverinfo='text'  # Display only the text on hover
-
-        )])
-
-        # Customize layout
         fig.update_layout(
-            paper_bgcolor="rgba(230, 230, 230, 0.8)",
-            width=800,
-            height=800,
-            scene=dict(
-                xaxis=dict(
-                    title='(N+O)/C',
-                    autorange=True
-                ),
-                yaxis=dict(
-                    title='SSA(m^2/mg)',
-                    autorange=True
-                ),
-                zaxis=dict(
-                    title='Adsorption (mg/g)',
-                    autorange=True
-                )
-            )
+            xaxis_title='O/C (atomic)',
+            yaxis_title='H/C (atomic)',
+            template='plotly_white',
+            height=600
         )
-
-        # 3D scatter plot
         st.plotly_chart(fig, use_container_width=True)
 
-### Instrument Data Viz
-st.write('''
+
+van_krevelen_section(master)
+
+
+### Inventory statistics
+@st.fragment
+def statistics_section(master):
+    st.write('''
     ---
-    ### Visualize instrument data  👇 
+    ### Inventory statistics 📊
     ''')
-with st.container(border=False):
-    data_file_sel = None
-    inst_col1, inst_col2, inst_col3 = st.columns((1, 1, 0.1), vertical_alignment='bottom')
-    with inst_col1:
-        instrument_sel = st.selectbox(label='Select the instrument to display data',
-                                      options=["infrared","x-ray"], placeholder="Instrument")
-    with inst_col2:
-        if instrument_sel:
-            istrmt_file_list = list_files(f"acbc_database/data/{instrument_sel}")
-            data_file_sel = st.selectbox(label=f"List of available {instrument_sel}", options=istrmt_file_list)
-    with inst_col3:
-        st.caption('Refresh')
-        with st.spinner('Reloading'):
-            if st.button('🔄️', key='filelist_refresh', type='secondary', use_container_width=True):
-                list_files.clear()
-
-    if st.button("Viz Spectrum"):
-        viz_file_col1, viz_file_col2 = st.columns([1, 3])
-        if data_file_sel is not None:
-            file_df = fetch_csv(f"acbc_database/data/{instrument_sel}/{data_file_sel}", header=None)
-            file_df.columns = ["X", "Y"]
-            viz_file_col1.dataframe(file_df)
-            viz_file_col2.plotly_chart(plot_line_chart(file_df, data_file_sel[:-4], 'Wavenumber', "Transmission"),
-                                       use_container_width=True)
+    st.caption('Mean and spread of a property across the whole inventory, grouped and filtered as you like')
+    cube = aggregation_cube(master)
+    stat_col1, stat_col2 = st.columns((1, 2))
+    with stat_col1:
+        measure = st.selectbox('Property', options=CUBE_MEASURES, key='cube_measure')
+        group_by = st.multiselect('Group by', options=CUBE_DIMENSIONS, default=['Feedstock'], key='cube_by')
+        where = {dimension: st.multiselect(f'Only {dimension}',
+                                           options=sorted(cube.cells.index.get_level_values(dimension).unique()),
+                                           key=f'cube_where_{dimension}')
+                 for dimension in CUBE_DIMENSIONS}
+    stats = cube.rollup(measure, group_by, where)
+    stats = stats[stats['n'] > 0]
+    with stat_col2:
+        if stats.empty:
+            st.info("No sample has this property for the current selection")
         else:
-            st.warning("No data to pull")
+            groups = [' | '.join(map(str, group)) if isinstance(group, tuple) else str(group) for group in stats.index]
+            fig = go.Figure(data=[go.Bar(x=groups, y=stats['mean'],
+                                         error_y=dict(type='data', array=stats['std'].fillna(0)),
+                                         text=stats['n'].map(lambda n: f'n={n}'), textposition='auto')])
+            fig.update_layout(title=f'Mean {measure}', xaxis_title=' | '.join(group_by) or 'All samples',
+                              yaxis_title=measure, template='plotly_white')
+            st.plotly_chart(fig, use_container_width=True)
+    st.dataframe(stats, use_container_width=True)
+
+
+statistics_section(master)
+
+
+### Similar biochars
+@st.fragment
+def similarity_section(master):
+    st.write('''
+    ---
+    ### Similar biochars 🔎
+    ''')
+    st.caption('Closest samples by ' + ', '.join(SIMILARITY_FEATURES) + ', missing values taken as the median')
+    sim_col1, sim_col2, sim_col3 = st.columns((3, 1, 1))
+    sample = sim_col1.selectbox('Sample', options=master['ShortName'].dropna().unique(), index=None,
+                                key='similar_sample')
+    k = sim_col2.number_input('Neighbours', min_value=1, max_value=50, value=10, key='similar_k')
+    with_ucd = sim_col3.toggle('Include UC Davis', key='similar_ucd')
+    if sample is not None:
+        ucd = get_ucd_database() if with_ucd else None
+        with span('similarity.query', k=k, ucd=ucd is not None):
+            similar = similarity_index(master, ucd).similar(sample, k)
+        st.dataframe(similar, use_container_width=True, hide_index=True)
+
+
+similarity_section(master)
+
+
+### Instrument Data Viz
+@st.fragment
+def instrument_section():
+    st.write('''
+        ---
+        ### Visualize instrument data  👇 
+        ''')
+    with st.container(border=False):
+        data_file_sel = None
+        inst_col1, inst_col2, inst_col3 = st.columns((1, 1, 0.1), vertical_alignment='bottom')
+        with inst_col1:
+            instrument_sel = st.selectbox(label='Select the instrument to display data',
+                                          options=["infrared","x-ray"], placeholder="Instrument")
+        with inst_col2:
+            if instrument_sel:
+                istrmt_file_list = list_files(f"acbc_database/data/{instrument_sel}")
+                data_file_sel = st.selectbox(label=f"List of available {instrument_sel}", options=istrmt_file_list)
+        with inst_col3:
+            st.caption('Refresh')
+            with st.spinner('Reloading'):
+                if st.button('🔄️', key='filelist_refresh', type='secondary', use_container_width=True):
+                    refresh()  # The file index is rebuilt only if the branch head moved
+
+        with st.expander("Preprocessing"):
+            pre_col1, pre_col2, pre_col3, pre_col4 = st.columns((1, 1, 1, 1))
+            pipeline = {
+                'baseline': pre_col1.selectbox('Baseline', options=BASELINES, key='pre_baseline'),
+                'degree': pre_col1.number_input('Baseline degree', min_value=1, max_value=8, value=3, key='pre_degree'),
+                'window': pre_col2.slider('Smoothing window (points)', min_value=1, max_value=51, value=1, step=2,
+                                          key='pre_window', help='Savitzky-Golay filter, 1 for none'),
+                'derivative': pre_col3.radio('Derivative', options=[0, 1, 2], horizontal=True, key='pre_derivative'),
+                'normalize': pre_col4.selectbox('Normalize', options=NORMALIZATIONS, key='pre_normalize'),
+            }
+            if pre_col2.toggle('Crop', key='pre_crop'):
+                crop_low = pre_col3.number_input('From X', value=400.0, key='pre_crop_low')
+                crop_high = pre_col4.number_input('To X', value=4000.0, key='pre_crop_high')
+                pipeline['x_range'] = (min(crop_low, crop_high), max(crop_low, crop_high))
+        # Processed spectra are cached per blob and pipeline, so toggling an option back costs nothing
+        pipeline = pipeline_key(pipeline)
+
+        if st.button("Viz Spectrum"):
+            # Kept in the session so zooming doesn't close the spectrum
+            st.session_state['viz_spectrum'] = (instrument_sel, data_file_sel) if data_file_sel is not None else None
+            if data_file_sel is None:
+                st.warning("No data to pull")
+
+        if st.session_state.get('viz_spectrum') is not None:
+            viz_instrument, viz_file = st.session_state['viz_spectrum']
+            viz_path = f"acbc_database/data/{viz_instrument}/{viz_file}"
+            grid, values, _, errors = preprocessed_spectra(((viz_path, get_file_index().blob_sha(viz_path)),), pipeline)
+            for file_path, error in errors.items():
+                st.error(f"Failed to fetch {file_path}: {error}")
+            if len(grid) > 1:
+                file_df = pd.DataFrame({"X": grid, "Y": values[0]})
+                x_min, x_max = float(file_df["X"].min()), float(file_df["X"].max())
+                x_range = st.slider('Zoom (X range)', min_value=x_min, max_value=x_max, value=(x_min, x_max),
+                                    key=f"zoom_{viz_instrument}_{viz_file}_{x_min}_{x_max}",
+                                    help='The visible range is redrawn from the full resolution data')
+                shown_df = downsample_frame(file_df, 2 * CHART_WIDTH, x_range)
+                viz_file_col1, viz_file_col2 = st.columns([1, 3])
+                viz_file_col1.dataframe(shown_df, hide_index=True)
+                viz_file_col1.caption(f"{len(shown_df)} of {len(file_df)} points shown")
+                viz_file_col2.plotly_chart(plot_line_chart(shown_df, viz_file.rsplit('.', 1)[0], 'Wavenumber',
+                                                           "Transmission"),
+                                           use_container_width=True)
+
+        overlay_files = st.multiselect(f"Overlay {instrument_sel} spectra", options=istrmt_file_list if instrument_sel else [],
+                                       placeholder='Files', help='Select the spectra you wish to compare')
+        if st.button("Overlay Spectra"):
+            if overlay_files:
+                file_index = get_file_index()
+                overlay_paths = [f"acbc_database/data/{instrument_sel}/{file}" for file in overlay_files]
+                grid, values, paths, errors = preprocessed_spectra(
+                    tuple((path, file_index.blob_sha(path)) for path in overlay_paths), pipeline)
+                for file_path, error in errors.items():
+                    st.error(f"Failed to fetch {file_path}: {error}")
+                if paths:
+                    names = [file_path.rsplit('/', 1)[-1].rsplit('.', 1)[0] for file_path in paths]
+                    st.plotly_chart(plot_overlay_chart(grid, values, names, f"{instrument_sel} overlay",
+                                                       'Wavenumber', "Transmission"),
+                                    use_container_width=True)
+            else:
+                st.warning("No data to pull")
+
+        match_col1, match_col2, match_col3 = st.columns((1, 1, 1), vertical_alignment='bottom')
+        match_method = match_col1.selectbox('Similarity', options=MATCH_METHODS, key='match_method')
+        match_k = match_col2.number_input('Matches', min_value=1, max_value=100, value=10, key='match_k')
+        if match_col3.button("Find similar spectra", help=f'Rank the {instrument_sel} library against the selected file'):
+            if data_file_sel is not None:
+                with st.spinner('Searching the library'):
+                    library = spectral_library(instrument_sel)
+                    data_file_path = f"acbc_database/data/{instrument_sel}/{data_file_sel}"
+                    if data_file_path in library.positions:
+                        matches = library.match(data_file_path, match_method, match_k)
+                        matches['path'] = matches['path'].str.rsplit('/', n=1).str[-1]
+                        st.dataframe(matches.rename(columns={'path': 'file'}), hide_index=True,
+                                     use_container_width=True)
+                    else:
+                        st.warning(f"{data_file_sel} is not in the {instrument_sel} library")
+            else:
+                st.warning("No data to pull")
+
+        peak_col1, peak_col2, peak_col3 = st.columns((1, 1, 1), vertical_alignment='bottom')
+        peak_center = peak_col1.number_input('Band position', value=1700.0, key='peak_center')
+        peak_tolerance = peak_col2.number_input('Tolerance (±)', min_value=0.0, value=20.0, key='peak_tolerance')
+        if peak_col3.button("Find samples with a peak here", help=f'Search the peaks of every {instrument_sel} file'):
+            with st.spinner('Searching the peak index'):
+                peaks = peak_index(instrument_sel).between(peak_center - peak_tolerance, peak_center + peak_tolerance,
+                                                           get_master())
+            if peaks.empty:
+                st.info(f"No {instrument_sel} peak between {peak_center - peak_tolerance:g} and "
+                        f"{peak_center + peak_tolerance:g}")
+            else:
+                peaks['path'] = peaks['path'].str.rsplit('/', n=1).str[-1]
+                st.dataframe(peaks.rename(columns={'path': 'file'}), hide_index=True, use_container_width=True)
+
+
+instrument_section()
@@ -3,11 +3,17 @@ import pandas as pd
 import os
 import subprocess
 from datetime import datetime
+from utils.fileindex import list_files
+from utils.forgejo import fetch_many
+from utils.inventory import get_master
+from utils.patches import PATCH_COLUMNS, apply_patches, read_patches
+from utils.schema import MASTER_SCHEMA, apply_schema, to_repository_columns
 
 st.warning("Repare the commit functions to Forgejo repository")
 
 date = datetime.today().strftime('%Y-%m-%d')
 directory = 'datalog'
+submitted_path = 'acbc_database/submitted_data'
 
 
 
@@ -34,7 +40,7 @@ def init_repo():
 def commit(data, commit_message,directory):
     # Save the DataFrame to master.csv
     csv_path = os.path.join(directory, 'master.csv')
-    data.to_csv(csv_path, index=False)
+    to_repository_columns(data).to_csv(csv_path, index=False)
 
     # Stage the file
     subprocess.run(['git', 'add', 'master.csv'], cwd=directory, check=True)
@@ -97,11 +103,11 @@ if all(key in st.session_state for key in ['name', 'email', 'roles']):
             Submit current inventory to version control
         ''')
 
-        # Load DataFrame if not in session state
-        if 'master' not in st.session_state and is_master_created():
-            st.session_state['master'] = pd.read_csv(os.path.join(directory, 'master.csv'))
-        if 'master' in st.session_state:
-            master = st.session_state['master']
+        # Shared inventory, falling back to the last local commit
+        master = get_master()
+        if master is None and is_master_created():
+            master = apply_schema(pd.read_csv(os.path.join(directory, 'master.csv')), MASTER_SCHEMA)
+        if master is not None:
             st.write(master)
         else:
             st.error('Master not loaded')
@@ -121,6 +127,38 @@ if all(key in st.session_state for key in ['name', 'email', 'roles']):
         if st.button("Show Differences"):
             diff_output = show_diff()
             st.code(diff_output, language="diff")
+
+        # Merging the cell patches submitted from the Edit Current Data form
+        st.subheader("Merge submitted edits", divider='green')
+        patch_files = [file for file in list_files(submitted_path) if file.startswith('Patch-')]
+        selected_patches = st.multiselect("Edit patches to merge", options=patch_files)
+        if st.button("Merge patches"):
+            if selected_patches and master is not None:
+                patch_frames, errors = fetch_many([f"{submitted_path}/{file}" for file in selected_patches],
+                                                  read_patches)
+                for file_path, error in errors.items():
+                    st.error(f"Failed to fetch {file_path}: {error}")
+                if patch_frames:
+                    patches = pd.concat(patch_frames.values(), ignore_index=True)
+                    patches = patches[PATCH_COLUMNS].astype('string').drop_duplicates(ignore_index=True)
+                    merged, conflicts = apply_patches(master, patches)
+                    st.session_state['merged_master'] = (merged, conflicts, len(patches) - len(conflicts))
+            else:
+                st.error("Select the patches to merge")
+
+        if 'merged_master' in st.session_state:
+            merged, conflicts, applied = st.session_state['merged_master']
+            st.success(f"{applied} cell(s) patched")
+            if not conflicts.empty:
+                st.warning(f"{len(conflicts)} patch(es) left out, review them by hand")
+                st.dataframe(conflicts, hide_index=True, use_container_width=True)
+            if st.button("Commit merged inventory to datalog"):
+                if not commit_message:
+                    st.error("Please provide a commit message.")
+                else:
+                    configure_git_committer(committer_name, committer_email)
+                    commit(merged, commit_message, directory)
+                    del st.session_state['merged_master']
     else:
         st.warning("Talk to an administrator to get access")
 else:
@@ -1,50 +1,11 @@
 import streamlit as st
 from streamlit import divider, caption
-import requests
-import pandas as pd
-import io
-
-# Repository details
-repo_url = st.secrets['forgejo']['repo_url']
-api_base = st.secrets['forgejo']['api_base']
-branch = "main"  # Adjust if the branch is different
-auth = (st.secrets['forgejo']['username'], st.secrets['forgejo']['password'])
-owner = st.secrets['forgejo']['owner']
-repo = st.secrets['forgejo']['repo']
-
-@st.cache_data
-def get_json_file(file_path):
-    """
-    Fetch a JSON file from a Forgejo repository and return its data.
-
-    Parameters:
-    - file_path (str): Path to the JSON file in the repository.
-
-    Returns:
-    - dict: Dictionary of DataFrames.
-    - None: If the fetch fails or the section is not found.
-    """
-    raw_url = f"{repo_url}/raw/{branch}/{file_path}"
-    try:
-        response = requests.get(raw_url, auth=auth)
-        if response.status_code == 200:
-            data = response.json()  # Parse JSON directly into a Python object
-            # Return a dictionary of DataFrames
-            dataframes = {}
-            for key, value in data.items():
-                df = pd.DataFrame(list(value.items()), columns=["Key", "Description"])
-                dataframes[key] = df
-            return dataframes
-        else:
-            st.error(f"Failed to fetch {file_path}. Status code: {response.status_code}")
-            return None
-    except requests.exceptions.RequestException as e:
-        st.error(f"Error: {e}")
-        return None
+from utils.forgejo import get_json_file
+from utils.inventory import NAMING_KEY_PATH
 
 
 with st.status("Loading documentation..."):
-    naming_keys = get_json_file('acbc_database/documentation/naming_key.json')
+    naming_keys = get_json_file(NAMING_KEY_PATH)
 
     st.success("Loaded!!!")
 
@@ -0,0 +1,51 @@
+import streamlit as st
+from utils.outbox import get_outbox, start_delivery
+from utils.perf import METRICS
+
+if "Administrator" in (st.session_state.get("roles") or []):
+    st.write('''
+        # Performance ⏱️
+        Where the time of the app goes, since the server started
+    ''')
+    if st.button('🔄️', key='perf_refresh'):
+        pass  # The click reruns the page with fresh numbers
+
+    stages, counters = METRICS.snapshot()
+    st.subheader("Stages", divider='green')
+    st.caption("Duration of each instrumented stage over its last 1000 calls")
+    st.dataframe(stages, hide_index=True, use_container_width=True,
+                 column_config={column: st.column_config.NumberColumn(format="%.1f")
+                                for column in ['p50 (ms)', 'p95 (ms)', 'max (ms)']})
+
+    st.subheader("Counters", divider='green')
+    hits = counters.get('cache.mirror.hit', 0)
+    misses = counters.get('cache.mirror.miss', 0)
+    cnt1, cnt2, cnt3 = st.columns(3)
+    cnt1.metric("HTTP requests", f"{counters.get('http.requests', 0):g}")
+    cnt2.metric("HTTP downloaded", f"{counters.get('http.bytes', 0) / 1e6:.1f} MB")
+    cnt3.metric("Disk mirror hit rate", f"{hits / (hits + misses):.0%}" if hits + misses else "-")
+    st.dataframe({'counter': list(counters), 'value': list(counters.values())}, hide_index=True)
+
+    st.subheader("Submission outbox", divider='green')
+    st.caption("Submissions saved locally and waiting to be committed to the repository")
+    outbox_stats, submissions = get_outbox().stats()
+    box1, box2, box3, box4 = st.columns(4)
+    box1.metric("Queue depth", outbox_stats['pending'])
+    box2.metric("Failed", outbox_stats['failed'])
+    box3.metric("Oldest pending",
+                f"{outbox_stats['oldest pending (s)']:.0f} s" if outbox_stats['oldest pending (s)'] is not None else "-")
+    box4.metric("Delivery latency p50 / p95",
+                f"{outbox_stats['latency p50 (s)']:.1f} / {outbox_stats['latency p95 (s)']:.1f} s"
+                if outbox_stats['latency p50 (s)'] is not None else "-")
+    st.dataframe(submissions, hide_index=True, use_container_width=True)
+    failed_ids = submissions.loc[submissions['status'] == 'failed', 'id'].tolist()
+    if failed_ids and st.button(f"Retry the {len(failed_ids)} failed submission(s)", key='outbox_retry'):
+        get_outbox().requeue(failed_ids)
+        start_delivery()
+
+    with st.expander("Prometheus snapshot"):
+        prometheus_text = METRICS.prometheus()
+        st.code(prometheus_text, language='text')
+        st.download_button("Download", prometheus_text, file_name='acbc_metrics.prom', mime='text/plain')
+else:
+    st.warning("Talk to an administrator to get access")
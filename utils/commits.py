@@ -0,0 +1,119 @@
+import streamlit as st
+import base64
+import hashlib
+import threading
+from utils.fileindex import load_file_index
+from utils.forgejo import api_base, branch, owner, repo, TIMEOUT, get_session, head_sha
+from utils.perf import count, span
+
+# Optional [submissions] section of secrets.toml
+submission_settings = st.secrets.get('submissions', {})
+MAX_ATTEMPTS = submission_settings.get('max_attempts', 3)  # Tries of a commit whose blob SHAs went stale
+STALE_STATUS = (404, 409, 422)  # Forgejo's answers to a create/update that doesn't match the branch
+
+
+class CommitConflict(ValueError):
+    """New files that turned out to exist in the repository with another content."""
+
+    def __init__(self, paths):
+        super().__init__(f"Already in the repository with another content: {', '.join(paths)}")
+        self.paths = paths
+
+
+class BlobShas:
+    """
+    Last known blob SHA of the repository files, so an update needs no GET to find it.
+
+    Unknown paths are looked up in the file index of the head commit, and the SHAs
+    returned by every commit are recorded.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.shas = {}
+
+    def get(self, path):
+        with self.lock:
+            if path in self.shas:
+                return self.shas[path]
+        return load_file_index(head_sha()).blob_sha(path)
+
+    def set(self, path, sha):
+        with self.lock:
+            self.shas[path] = sha
+
+    def refresh(self, paths):
+        """Forget the SHAs of paths and re-read them from the file index of the latest head."""
+        index = load_file_index(head_sha(force=True))
+        with self.lock:
+            for path in paths:
+                self.shas.pop(path, None)
+        return {path: index.blob_sha(path) for path in paths}
+
+
+def git_blob_sha(content):
+    """SHA git gives a blob with this content."""
+    return hashlib.sha1(b'blob %d\0' % len(content) + content).hexdigest()
+
+
+@st.cache_resource
+def get_blob_shas():
+    return BlobShas()
+
+
+def change_set(files, message):
+    """
+    Commit several files to the branch at once through the contents API.
+
+    Every file is sent as an update of its known blob SHA, or as a creation when it isn't in
+    the repository yet. If a SHA turned out stale, the SHAs are re-read at the latest head and
+    the commit retried, up to MAX_ATTEMPTS times, leaving out the files that already hold
+    their new content, so retrying a commit that went through is harmless. A file sent as a
+    creation that someone else created meanwhile is never overwritten.
+
+    Parameters:
+    - files (dict): Repository path -> new content (bytes).
+    - message (str): The commit message.
+
+    Returns:
+    - bool: True if the commit was made.
+    - str: A message describing the outcome.
+
+    Raises:
+    - CommitConflict: If files sent as creations exist with another content; nothing is committed.
+    """
+    blob_shas = get_blob_shas()
+    shas = {path: blob_shas.get(path) for path in files}
+    created = {path for path, sha in shas.items() if not sha}
+    url = f"{api_base}/repos/{owner}/{repo}/contents"
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        payload = {
+            "message": message,
+            "branch": branch,
+            "files": [{"operation": "update" if shas[path] else "create",
+                       "path": path,
+                       "content": base64.b64encode(content).decode(),
+                       **({"sha": shas[path]} if shas[path] else {})}
+                      for path, content in files.items()],
+        }
+        with span('commit', files=len(files), attempt=attempt):
+            response = get_session().post(url, json=payload, timeout=TIMEOUT)
+        count('commit.requests')
+        if response.status_code in (200, 201):
+            for committed in (response.json() or {}).get('files') or []:
+                if committed and committed.get('path') and committed.get('sha'):
+                    blob_shas.set(committed['path'], committed['sha'])
+            return True, f"{len(files)} file(s) committed"
+        if response.status_code not in STALE_STATUS:
+            break
+        count('commit.stale_sha')
+        shas = blob_shas.refresh(list(files))
+        # Files already holding this content (an earlier try went through) are not sent again
+        files = {path: content for path, content in files.items() if shas[path] != git_blob_sha(content)}
+        conflicts = [path for path in files if path in created and shas[path]]
+        if conflicts:
+            count('commit.conflicts')
+            raise CommitConflict(conflicts)
+        if not files:
+            return True, "Already committed"
+    return False, f"Failed to commit: {response.text}"
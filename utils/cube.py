@@ -0,0 +1,151 @@
+import streamlit as st
+import numpy as np
+import pandas as pd
+import threading
+
+MEASURES = ['BET(m2/g)', 'Capacity(mmol/g)', 'pH', 'Yield(%)']
+DIMENSIONS = ['Feedstock', 'PyrolysisType', 'Temp bin']
+TEMP_BIN_WIDTH = 100  # Celsius
+
+
+def cube_keys(df):
+    """Dimension values of each row, missing values labelled 'unknown'."""
+    temps = df['Temp(C)'].to_numpy(dtype=float, na_value=np.nan)
+    starts = np.floor(temps / TEMP_BIN_WIDTH) * TEMP_BIN_WIDTH
+    temp_bins = pd.Series(starts, index=df.index).map(
+        lambda start: f"{start:.0f}-{start + TEMP_BIN_WIDTH - 1:.0f}", na_action='ignore')
+    return pd.DataFrame({
+        'Feedstock': df['Feedstock'].astype('string').fillna('unknown'),
+        'PyrolysisType': df['PyrolysisType'].astype('string').fillna('unknown'),
+        'Temp bin': temp_bins.fillna('unknown'),
+    }, index=df.index)
+
+
+def moments(df):
+    """
+    Mergeable statistics of rows per cube cell: the row count, and per measure its count,
+    sum and sum of squares. Moments of disjoint sets of rows add up.
+    """
+    columns = {'rows': np.ones(len(df))}
+    for measure in MEASURES:
+        values = df[measure].to_numpy(dtype=float, na_value=np.nan)
+        known = ~np.isnan(values)
+        values = np.where(known, values, 0.0)
+        columns[f'{measure} n'] = known.astype(float)
+        columns[f'{measure} sum'] = values
+        columns[f'{measure} sumsq'] = values ** 2
+    cells = pd.DataFrame(columns, index=df.index)
+    return cells.groupby([keys for _, keys in cube_keys(df).items()]).sum()
+
+
+class AggregationCube:
+    """
+    Count, sum and sum of squares of BET, Capacity, pH and Yield per Feedstock x PyrolysisType x Temp bin.
+
+    Any roll-up or drill-down is answered from the cells (a few hundred rows at most)
+    without going back to the inventory, and changed rows are applied as deltas.
+    """
+
+    def __init__(self, df=None, cells=None):
+        self.cells = moments(df) if cells is None else cells
+
+    def apply_changes(self, added=None, removed=None):
+        """
+        Update the cells with added and removed inventory rows (an edited row is both).
+
+        Parameters:
+        - added (pandas.DataFrame): New rows. Default = None
+        - removed (pandas.DataFrame): Rows that are gone. Default = None
+        """
+        cells = self.cells
+        if added is not None and len(added):
+            cells = cells.add(moments(added), fill_value=0)
+        if removed is not None and len(removed):
+            cells = cells.sub(moments(removed), fill_value=0)
+        self.cells = cells[cells['rows'] > 0.5]
+
+    def rollup(self, measure, by, where=None):
+        """
+        Statistics of one measure grouped by some of the dimensions.
+
+        Parameters:
+        - measure (str): One of MEASURES.
+        - by (list): Dimensions to group by, the others are summed over.
+        - where (dict): Dimension -> accepted values, to drill down. Default = None
+
+        Returns:
+        - pandas.DataFrame: samples, n (samples with a value), mean and std per group.
+        """
+        cells = self.cells
+        for dimension, values in (where or {}).items():
+            if values:
+                cells = cells[cells.index.get_level_values(dimension).isin(values)]
+        if by:
+            cells = cells.groupby(level=by).sum()
+        else:
+            cells = cells.sum().to_frame('All').T
+        n = cells[f'{measure} n']
+        total = cells[f'{measure} sum']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = total / n
+            variance = (cells[f'{measure} sumsq'] - total ** 2 / n) / (n - 1)
+        return pd.DataFrame({
+            'samples': cells['rows'].round().astype(int),
+            'n': n.round().astype(int),
+            'mean': mean.where(n > 0),
+            'std': np.sqrt(variance.clip(lower=0)).where(n > 1),
+        })
+
+
+def row_keys(df):
+    """Content hash of each row's cube columns, numbered so identical rows stay distinct."""
+    hashes = pd.util.hash_pandas_object(df[['Feedstock', 'PyrolysisType', 'Temp(C)'] + MEASURES], index=False)
+    occurrence = hashes.groupby(hashes).cumcount()
+    return hashes.astype(str) + ':' + occurrence.astype(str)
+
+
+class CubeHolder:
+    """
+    The process-wide cube, moved from one master version to the next by row deltas.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.master = None
+        self.keys = None
+        self.cube = None
+
+    def cube_for(self, master):
+        if self.master is master:
+            return self.cube
+        with self.lock:
+            if self.master is master:
+                return self.cube
+            keys = row_keys(master)
+            if self.cube is None:
+                cube = AggregationCube(master)
+            else:
+                cube = AggregationCube(cells=self.cube.cells)
+                cube.apply_changes(added=master[~keys.isin(self.keys).to_numpy()],
+                                   removed=self.master[~self.keys.isin(keys).to_numpy()])
+            # A new object, so sessions still reading the previous cube aren't affected
+            self.master, self.keys, self.cube = master, keys, cube
+            return cube
+
+
+@st.cache_resource
+def get_cube_holder():
+    return CubeHolder()
+
+
+def aggregation_cube(master):
+    """
+    Aggregation cube of the current master, built once and then updated with the changed rows only.
+
+    Parameters:
+    - master (pandas.DataFrame): The shared master inventory.
+
+    Returns:
+    - AggregationCube: The cube.
+    """
+    return get_cube_holder().cube_for(master)
@@ -0,0 +1,179 @@
+import os
+import sqlite3
+import hashlib
+import tempfile
+import time
+import threading
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+class DiskMirror:
+    """
+    Local copy of repository files that survives container restarts.
+
+    Every file is kept as its raw bytes plus, when it is tabular, a Parquet copy of the parsed
+    DataFrame. Each entry remembers the head SHA it was last validated at, its ETag and the
+    digest of its raw bytes, which names the parsed copies made from them. The least recently
+    used entries are evicted once the mirror, raw and parsed copies together, grows past max_bytes.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(os.path.join(directory, 'files'), exist_ok=True)
+        for name in os.listdir(os.path.join(directory, 'files')):
+            if name.startswith('tmp-'):  # Left by a write that didn't finish
+                os.remove(os.path.join(directory, 'files', name))
+        with self.connect() as db:
+            columns = [row[1] for row in db.execute('PRAGMA table_info(entries)')]
+            if columns and 'digest' not in columns:
+                # Mirror of an older layout, whose parsed copies can't be matched to their raw bytes
+                db.execute('DROP TABLE entries')
+                for name in os.listdir(os.path.join(directory, 'files')):
+                    os.remove(os.path.join(directory, 'files', name))
+            db.execute('''CREATE TABLE IF NOT EXISTS entries (
+                              path TEXT PRIMARY KEY,
+                              head_sha TEXT,
+                              etag TEXT,
+                              last_modified TEXT,
+                              size INTEGER,
+                              accessed REAL,
+                              digest TEXT)''')
+            db.execute('''CREATE TABLE IF NOT EXISTS parsed (
+                              path TEXT,
+                              key TEXT,
+                              size INTEGER,
+                              PRIMARY KEY (path, key))''')
+
+    def connect(self):
+        return sqlite3.connect(os.path.join(self.directory, 'index.sqlite'), timeout=10)
+
+    def file_name(self, path, suffix):
+        return os.path.join(self.directory, 'files', hashlib.sha1(path.encode()).hexdigest() + suffix)
+
+    def lookup(self, path):
+        """
+        Parameters:
+        - path (str): Path of the file in the repository.
+
+        Returns:
+        - tuple: (head_sha, etag, last_modified, digest) of the mirrored copy.
+        - None: If the file isn't mirrored.
+        """
+        with self.connect() as db:
+            return db.execute('SELECT head_sha, etag, last_modified, digest FROM entries WHERE path = ?',
+                              (path,)).fetchone()
+
+    def read_raw(self, path):
+        try:
+            with open(self.file_name(path, '.bin'), 'rb') as file:
+                content = file.read()
+        except FileNotFoundError:
+            return None
+        self.touch(path)
+        return content
+
+    def temporary_file(self):
+        """New file to write a copy to before moving it in place, so readers never see it half written."""
+        descriptor, temporary = tempfile.mkstemp(prefix='tmp-', dir=os.path.join(self.directory, 'files'))
+        os.close(descriptor)
+        return temporary
+
+    @staticmethod
+    def digest(content):
+        """Identifies raw bytes, and the parsed copies made from them."""
+        return hashlib.sha1(content).hexdigest()
+
+    def write_raw(self, path, head_sha, content, etag=None, last_modified=None):
+        temporary = self.temporary_file()
+        with open(temporary, 'wb') as file:
+            file.write(content)
+        with self.lock:
+            # The entry goes first: a copy left without its ETag is fetched again, never trusted
+            with self.connect() as db:
+                db.execute('DELETE FROM entries WHERE path = ?', (path,))
+                db.execute('DELETE FROM parsed WHERE path = ?', (path,))
+            self.remove_files(path)
+            os.replace(temporary, self.file_name(path, '.bin'))
+            with self.connect() as db:
+                db.execute('REPLACE INTO entries (path, head_sha, etag, last_modified, size, accessed, digest) '
+                           'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                           (path, head_sha, etag, last_modified, len(content), time.time(), self.digest(content)))
+            self.evict()
+
+    def stamp(self, path, head_sha):
+        """Mark the mirrored copy as still current at head_sha (the repository answered 304)."""
+        with self.connect() as db:
+            db.execute('UPDATE entries SET head_sha = ?, accessed = ? WHERE path = ?',
+                       (head_sha, time.time(), path))
+
+    def touch(self, path):
+        with self.connect() as db:
+            db.execute('UPDATE entries SET accessed = ? WHERE path = ?', (time.time(), path))
+
+    def read_parsed(self, path, key, digest):
+        """
+        Parameters:
+        - path (str): Path of the file in the repository.
+        - key (str): Identifies how the file was parsed (e.g., 'csv-0').
+        - digest (str): Digest of the raw bytes the parsed copy must come from.
+
+        Returns:
+        - pandas.DataFrame: The parsed copy, read from a memory map without consolidating columns.
+        - None: If there is no parsed copy.
+        """
+        try:
+            table = pq.read_table(self.file_name(path, f'.{key}.{digest}.parquet'), memory_map=True)
+        except (FileNotFoundError, pa.ArrowInvalid):
+            return None
+        self.touch(path)
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+
+    def write_parsed(self, path, key, digest, df):
+        """
+        Store the parsed copy of a mirrored file, made from the raw bytes with this digest.
+
+        The copy is dropped if the raw bytes were replaced meanwhile, and so are frames
+        Parquet can't represent.
+        """
+        temporary = self.temporary_file()
+        try:
+            pq.write_table(pa.Table.from_pandas(df, preserve_index=False), temporary)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, ValueError):
+            os.remove(temporary)
+            return
+        with self.lock:
+            entry = self.lookup(path)
+            if entry is None or entry[3] != digest:
+                os.remove(temporary)
+                return
+            os.replace(temporary, self.file_name(path, f'.{key}.{digest}.parquet'))
+            with self.connect() as db:
+                db.execute('REPLACE INTO parsed VALUES (?, ?, ?)',
+                           (path, key, os.path.getsize(self.file_name(path, f'.{key}.{digest}.parquet'))))
+            self.evict()
+
+    def remove_files(self, path):
+        prefix = hashlib.sha1(path.encode()).hexdigest()
+        files_dir = os.path.join(self.directory, 'files')
+        for name in os.listdir(files_dir):
+            if name.startswith(prefix):
+                os.remove(os.path.join(files_dir, name))
+
+    def evict(self):
+        """Drop the least recently used entries until the mirror fits in max_bytes."""
+        with self.connect() as db:
+            total = db.execute('SELECT (SELECT COALESCE(SUM(size), 0) FROM entries) + '
+                               '(SELECT COALESCE(SUM(size), 0) FROM parsed)').fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for path, size in db.execute('SELECT path, size + (SELECT COALESCE(SUM(size), 0) FROM parsed '
+                                         'WHERE parsed.path = entries.path) FROM entries ORDER BY accessed').fetchall():
+                if total <= self.max_bytes:
+                    break
+                self.remove_files(path)
+                db.execute('DELETE FROM entries WHERE path = ?', (path,))
+                db.execute('DELETE FROM parsed WHERE path = ?', (path,))
+                total -= size
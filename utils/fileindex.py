@@ -0,0 +1,115 @@
+import streamlit as st
+import pandas as pd
+from utils.forgejo import api_base, owner, repo, head_sha, http_get
+
+DATA_ROOT = "acbc_database/data"
+TREE_PAGE_SIZE = 1000
+SAMPLE_CODE = r'^(?:ACBC[A-Z]_)?([A-Z]{3}\d{4})'  # XXX#### part of ShortName, see the naming docs
+
+
+def fetch_tree(sha):
+    """
+    Every file of the repository at a commit, from the recursive git-tree endpoint.
+
+    Parameters:
+    - sha (str): The commit SHA.
+
+    Returns:
+    - list: Dicts with the path, size and blob sha of each file.
+
+    Raises:
+    - requests.HTTPError: If the repository answers with an error status.
+    """
+    url = f"{api_base}/repos/{owner}/{repo}/git/trees/{sha}"
+    entries, page = [], 1
+    while True:
+        response = http_get(url, params={'recursive': 'true', 'per_page': TREE_PAGE_SIZE, 'page': page})
+        response.raise_for_status()
+        tree = response.json()
+        entries.extend({'path': item['path'], 'size': item.get('size', 0), 'sha': item['sha']}
+                       for item in tree.get('tree') or [] if item['type'] == 'blob')
+        # Large trees come back in pages, flagged as truncated
+        if not tree.get('truncated'):
+            return entries
+        page += 1
+
+
+class FileIndex:
+    """
+    Queryable table of every file of the repository at one commit.
+    """
+
+    def __init__(self, entries):
+        files = pd.DataFrame(entries, columns=['path', 'size', 'sha'])
+        parts = files['path'].str.rsplit('/', n=1, expand=True).reindex(columns=[0, 1])
+        files['folder'] = parts[0].where(parts[1].notna(), '')
+        files['name'] = parts[1].fillna(parts[0])
+        files['extension'] = files['name'].str.extract(r'\.([^.]+)$', expand=False).str.lower().fillna('')
+        in_data = files['path'].str.startswith(DATA_ROOT + '/')
+        files['instrument'] = files['path'].str[len(DATA_ROOT) + 1:].str.split('/').str[0].where(in_data)
+        files['sample'] = files['name'].str.extract(SAMPLE_CODE, expand=False)
+        self.files = files.sort_values('path', ignore_index=True)
+        self.blob_shas = dict(zip(self.files['path'], self.files['sha']))
+
+    def query(self, instrument=None, sample=None, extension=None, folder=None):
+        """
+        Files matching every given filter.
+
+        Parameters:
+        - instrument (str): Instrument folder under acbc_database/data (e.g., 'infrared'). Default = None
+        - sample (str): ShortName or its XXX#### prefix (e.g., 'KMS0001_SW620'). Default = None
+        - extension (str or list): File extension(s), without the dot. Default = None
+        - folder (str): Folder the files are in, subfolders included. Default = None
+
+        Returns:
+        - pandas.DataFrame: The matching rows (path, size, sha, folder, name, extension, instrument, sample).
+        """
+        mask = pd.Series(True, index=self.files.index)
+        if instrument is not None:
+            mask &= self.files['instrument'] == instrument
+        if sample is not None:
+            mask &= self.files['sample'] == sample.split('_')[0]
+        if extension is not None:
+            extensions = [extension] if isinstance(extension, str) else extension
+            mask &= self.files['extension'].isin([e.lower().lstrip('.') for e in extensions])
+        if folder is not None:
+            folder = folder.rstrip('/')
+            mask &= (self.files['folder'] == folder) | self.files['folder'].str.startswith(folder + '/')
+        return self.files[mask]
+
+    def blob_sha(self, path):
+        """Blob SHA of a file, or None if it isn't in the index."""
+        return self.blob_shas.get(path)
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def load_file_index(sha):
+    return FileIndex(fetch_tree(sha))
+
+
+def get_file_index():
+    """
+    File index at the current head commit, shared by all sessions until the head moves.
+
+    Returns:
+    - FileIndex: The index.
+    """
+    return load_file_index(head_sha())
+
+
+def list_files(subfolder_path):
+    """
+    Lists all files in the specified subfolder of the Forgejo repository, subfolders included.
+
+    Parameters:
+    - subfolder_path (str): The path to the subfolder (e.g., 'acbc_database').
+
+    Returns:
+    - list: A list of file paths (relative to the subfolder).
+    """
+    try:
+        files = get_file_index().query(folder=subfolder_path)
+        return files['path'].str[len(subfolder_path.rstrip('/')) + 1:].tolist()
+    except Exception as e:
+        st.error(f"Error listing files: {e}")
+        return []
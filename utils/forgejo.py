@@ -0,0 +1,324 @@
+import streamlit as st
+import requests
+import pandas as pd
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from urllib3.util.retry import Retry
+from utils.diskcache import DiskMirror
+from utils.perf import count, span
+
+# Repository details
+repo_url = st.secrets['forgejo']['repo_url']
+api_base = st.secrets['forgejo']['api_base']
+branch = "main"  # Adjust if the branch is different
+auth = (st.secrets['forgejo']['username'], st.secrets['forgejo']['password'])
+owner = st.secrets['forgejo']['owner']
+repo = st.secrets['forgejo']['repo']
+
+TIMEOUT = (5, 30)  # (connect, read) seconds for every call to the repository
+
+# Optional [cache] section of secrets.toml
+cache_settings = st.secrets.get('cache', {})
+HEAD_POLL_SECONDS = cache_settings.get('head_poll_seconds', 30)
+MIRROR_DIR = cache_settings.get('dir', '.cache/acbc_database')
+MIRROR_MAX_MB = cache_settings.get('max_mb', 512)
+FETCH_WORKERS = cache_settings.get('fetch_workers', 8)  # Keep at or below the session's pool_maxsize
+
+
+@st.cache_resource
+def get_session():
+    """
+    Shared HTTP session for every call to the Forgejo repository.
+
+    The session keeps a pool of keep-alive connections, so reruns and sessions
+    reuse the same TLS connections instead of opening a new one per request.
+
+    Returns:
+    - requests.Session: Authenticated session with pooling and retries on gateway errors.
+    """
+    session = requests.Session()
+    session.auth = auth
+    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=(502, 503, 504),
+                    allowed_methods=frozenset(['GET', 'HEAD']))
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retries)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def http_get(url, **kwargs):
+    """
+    GET through the shared session, timed as the 'http.get' stage and counted in 'http.bytes'.
+
+    Parameters:
+    - url (str): The url to fetch.
+    - kwargs: Passed to requests.Session.get (params, headers...).
+
+    Returns:
+    - requests.Response: The response.
+    """
+    with span('http.get', url=url):
+        response = get_session().get(url, timeout=TIMEOUT, **kwargs)
+    count('http.requests')
+    count('http.bytes', len(response.content))
+    return response
+
+
+class ValidatorStore:
+    """
+    Last ETag/Last-Modified seen per url, with the object parsed from that response.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def get(self, key):
+        with self.lock:
+            return self.entries.get(key)
+
+    def put(self, key, etag, last_modified, value):
+        with self.lock:
+            self.entries[key] = (etag, last_modified, value)
+
+
+@st.cache_resource
+def get_validators():
+    return ValidatorStore()
+
+
+def conditional_get(url, parse, key=None, params=None):
+    """
+    GET a url, revalidating against the last response seen for it.
+
+    When a previous response is known the request carries If-None-Match/If-Modified-Since,
+    and a 304 answer returns the object parsed last time without downloading or parsing again.
+
+    Parameters:
+    - url (str): The url to fetch.
+    - parse (callable): Turns the requests.Response into the object to return.
+    - key (hashable): Distinguishes several parsings of the same url. Default = None
+    - params (dict): Query parameters of the request. Default = None
+
+    Returns:
+    - object: The parsed response.
+
+    Raises:
+    - requests.HTTPError: If the repository answers with an error status.
+    """
+    validators = get_validators()
+    entry_key = (url, tuple(sorted((params or {}).items())), key)
+    entry = validators.get(entry_key)
+    headers = {}
+    if entry is not None:
+        etag, last_modified, _ = entry
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
+    response = http_get(url, params=params, headers=headers)
+    if response.status_code == 304 and entry is not None:
+        count('cache.http.not_modified')
+        return entry[2]
+    response.raise_for_status()
+
+    value = parse(response)
+    validators.put(entry_key, response.headers.get('ETag'), response.headers.get('Last-Modified'), value)
+    return value
+
+
+class HeadPoller:
+    """
+    Commit SHA at the head of the branch, asked to Forgejo at most every HEAD_POLL_SECONDS.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sha = None
+        self.checked_at = 0.0
+
+    def head_sha(self, force=False):
+        if not force and self.sha is not None and time.monotonic() - self.checked_at < HEAD_POLL_SECONDS:
+            return self.sha
+        with self.lock:
+            # Another session may have polled while this one waited for the lock
+            if not force and self.sha is not None and time.monotonic() - self.checked_at < HEAD_POLL_SECONDS:
+                return self.sha
+            try:
+                self.sha = conditional_get(f"{api_base}/repos/{owner}/{repo}/branches/{branch}",
+                                           lambda response: response.json()['commit']['id'])
+            except Exception:
+                if self.sha is None:
+                    raise
+                # Keep serving the last known version while the repository is unreachable
+            self.checked_at = time.monotonic()
+            return self.sha
+
+
+@st.cache_resource
+def get_head_poller():
+    return HeadPoller()
+
+
+def head_sha(force=False):
+    """
+    Commit SHA at the head of the repository branch.
+
+    Parameters:
+    - force (bool): Ask Forgejo now instead of reusing a poll younger than HEAD_POLL_SECONDS. Default = False
+
+    Returns:
+    - str: The commit SHA.
+    """
+    return get_head_poller().head_sha(force)
+
+
+@st.cache_resource
+def get_mirror():
+    return DiskMirror(MIRROR_DIR, MIRROR_MAX_MB * 1024 * 1024)
+
+
+def raw_url(file_path):
+    return f"{repo_url}/raw/{branch}/{file_path}"
+
+
+def fetch_bytes(file_path, sha=None):
+    """
+    Raw content of a repository file, served from the disk mirror while it is current.
+
+    A mirrored copy validated at the current head SHA is returned without any request.
+    An older copy is revalidated with its ETag and only downloaded again if it changed.
+
+    Parameters:
+    - file_path (str): Path to the file in the repository.
+    - sha (str): Head SHA to validate against. Default = None, the current head
+
+    Returns:
+    - bytes: The file content.
+
+    Raises:
+    - requests.HTTPError: If the repository answers with an error status.
+    """
+    sha = sha or head_sha()
+    mirror = get_mirror()
+    entry = mirror.lookup(file_path)
+    if entry is not None and entry[0] == sha:
+        content = mirror.read_raw(file_path)
+        if content is not None:
+            count('cache.mirror.hit')
+            return content
+    count('cache.mirror.miss')
+
+    headers = {}
+    if entry is not None:
+        if entry[1]:
+            headers['If-None-Match'] = entry[1]
+        if entry[2]:
+            headers['If-Modified-Since'] = entry[2]
+    response = http_get(raw_url(file_path), headers=headers)
+    if response.status_code == 304:
+        content = mirror.read_raw(file_path)
+        if content is not None:
+            count('cache.http.not_modified')
+            mirror.stamp(file_path, sha)
+            return content
+        response = http_get(raw_url(file_path))
+    response.raise_for_status()
+
+    mirror.write_raw(file_path, sha, response.content,
+                     response.headers.get('ETag'), response.headers.get('Last-Modified'))
+    return response.content
+
+
+def read_parsed(file_path, key, parse, sha=None):
+    """
+    Parsed repository file, reusing the mirror's Parquet copy when the file didn't change.
+
+    Parameters:
+    - file_path (str): Path to the file in the repository.
+    - key (str): Identifies the parsing, one Parquet copy is kept per key.
+    - parse (callable): Turns the raw bytes into a DataFrame.
+    - sha (str): Head SHA to validate against. Default = None, the current head
+
+    Returns:
+    - pandas.DataFrame: The parsed file.
+
+    Raises:
+    - requests.HTTPError: If the repository answers with an error status.
+    """
+    mirror = get_mirror()
+    content = fetch_bytes(file_path, sha)  # Validates (or refreshes) the mirrored copy first
+    digest = mirror.digest(content)  # The parsed copy must come from these very bytes
+    with span('mirror.read_parsed'):
+        df = mirror.read_parsed(file_path, key, digest)
+    if df is None:
+        with span('parse', file=file_path):
+            df = parse(content)
+        mirror.write_parsed(file_path, key, digest, df)
+    return df
+
+
+def fetch_many(file_paths, reader, max_workers=FETCH_WORKERS):
+    """
+    Read several repository files concurrently over a bounded thread pool.
+
+    The mirrored copies of the whole batch are validated against one polled head SHA, but files
+    that are downloaded come from the branch tip, so a push during the batch can mix versions.
+    The workers share the session's connection pool.
+
+    Parameters:
+    - file_paths (list): Paths of the files in the repository.
+    - reader (callable): Called as reader(file_path, sha=sha) in a worker (e.g., read_spectrum).
+    - max_workers (int): Maximum number of concurrent downloads. Default = FETCH_WORKERS
+
+    Returns:
+    - dict: file path -> result, for the files that could be read.
+    - dict: file path -> exception, for the files that failed.
+    """
+    if not file_paths:
+        return {}, {}
+    sha = head_sha()
+    ctx = get_script_run_ctx()  # Lets the workers use st.cache_resource like the page does
+    results, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(file_paths)),
+                            initializer=add_script_run_ctx, initargs=(None, ctx)) as executor:
+        futures = {file_path: executor.submit(reader, file_path, sha=sha) for file_path in file_paths}
+        for file_path, future in futures.items():
+            try:
+                results[file_path] = future.result()
+            except Exception as e:
+                errors[file_path] = e
+    return results, errors
+
+
+@st.cache_data
+def get_json_file(file_path):
+    """
+    Fetch a JSON file from a Forgejo repository and return its data.
+
+    Parameters:
+    - file_path (str): Path to the JSON file in the repository.
+
+    Returns:
+    - dict: Dictionary of DataFrames.
+    - None: If the fetch fails or the section is not found.
+    """
+    try:
+        data = json.loads(fetch_bytes(file_path))
+        # Return a dictionary of DataFrames
+        dataframes = {}
+        for key, value in data.items():
+            df = pd.DataFrame(list(value.items()), columns=["Key", "Description"])
+            dataframes[key] = df
+        return dataframes
+    except requests.HTTPError as e:
+        st.error(f"Failed to fetch {file_path}. Status code: {e.response.status_code}")
+        return None
+    except requests.exceptions.RequestException as e:
+        st.error(f"Error: {e}")
+        return None
@@ -0,0 +1,106 @@
+import streamlit as st
+import pandas as pd
+import io
+import hashlib
+import threading
+from utils.forgejo import head_sha, read_parsed
+from utils.perf import count
+from utils.schema import MASTER_SCHEMA, apply_schema
+
+MASTER_PATH = "acbc_database/master.csv"
+UCD_PATH = "uc_davis_database/UC_Davis_Biochar_Database.csv"
+NAMING_KEY_PATH = "acbc_database/documentation/naming_key.json"
+
+SCHEMAS = {
+    MASTER_PATH: MASTER_SCHEMA,
+    UCD_PATH: None,  # Inferred, see apply_schema
+}
+
+
+class SharedFrames:
+    """
+    One DataFrame per repository file for the whole process, tagged with the head SHA it was read at.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.file_locks = {}
+        self.frames = {}
+
+    def get(self, file_path, sha, loader):
+        entry = self.frames.get(file_path)
+        if entry is not None and entry[0] == sha:
+            count('cache.frames.hit')
+            return entry[1]
+        count('cache.frames.miss')
+        with self.lock:
+            file_lock = self.file_locks.setdefault(file_path, threading.Lock())
+        with file_lock:
+            # Only the first session to see a new SHA downloads the file
+            entry = self.frames.get(file_path)
+            if entry is not None and entry[0] == sha:
+                return entry[1]
+            df = loader(file_path)
+            self.frames[file_path] = (sha, df)
+            return df
+
+
+@st.cache_resource
+def get_shared_frames():
+    return SharedFrames()
+
+
+def read_inventory_csv(file_path):
+    """
+    Typed snapshot of a repository csv, without its empty rows.
+
+    The snapshot is kept as Parquet in the disk mirror, so the csv is only parsed and typed
+    again when it changes or when its schema does.
+
+    Parameters:
+    - file_path (str): Path to the csv in the repository.
+
+    Returns:
+    - pandas.DataFrame: The csv cast to its schema (see utils/schema.py).
+    """
+    schema = SCHEMAS.get(file_path)
+    key = 'typed-' + hashlib.sha1(repr(schema).encode()).hexdigest()[:10]
+    return read_parsed(file_path, key,
+                       lambda content: apply_schema(pd.read_csv(io.BytesIO(content)).dropna(axis=0, how='all'),
+                                                    schema))
+
+
+def load_shared(file_path):
+    """
+    Shared, read-only DataFrame of a repository csv at the current head commit.
+
+    Every session gets the same object and the file is downloaded again only when the
+    head SHA moves. Copy the frame before modifying it.
+
+    Parameters:
+    - file_path (str): Path to the csv in the repository.
+
+    Returns:
+    - pandas.DataFrame: The csv as a DataFrame.
+    - None: If the repository can't be reached.
+    """
+    try:
+        return get_shared_frames().get(file_path, head_sha(), read_inventory_csv)
+    except Exception as e:
+        st.error(f"Failed to load {file_path}: {e}")
+        return None
+
+
+def get_master():
+    """Shared master inventory, see load_shared."""
+    return load_shared(MASTER_PATH)
+
+
+def get_ucd_database():
+    """Shared UC Davis database, see load_shared."""
+    return load_shared(UCD_PATH)
+
+
+def refresh():
+    """Check the branch head now; files are downloaded again only if it moved."""
+    head_sha(force=True)
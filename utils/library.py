@@ -0,0 +1,149 @@
+import streamlit as st
+import hashlib
+import json
+import logging
+import os
+import numpy as np
+import pandas as pd
+from utils.fileindex import get_file_index
+from utils.forgejo import MIRROR_DIR, fetch_many
+from utils.perf import span
+from utils.readers import READERS, read_spectrum
+from utils.spectra import common_grid
+
+LIBRARY_DIR = os.path.join(MIRROR_DIR, 'library')
+LIBRARY_POINTS = 2048  # Size of the common grid every spectrum is resampled to
+METHODS = ['correlation', 'cosine']
+
+logger = logging.getLogger(__name__)
+
+
+def unit_rows(values, center=False):
+    """Rows scaled to unit length (after removing their mean if center), NaN taken as 0."""
+    if center:
+        values = values - np.nanmean(values, axis=1, keepdims=True)
+    values = np.nan_to_num(values, nan=0.0)
+    norms = np.linalg.norm(values, axis=1, keepdims=True)
+    return (values / np.where(norms > 0, norms, 1.0)).astype(np.float32)
+
+
+def library_version(instrument, files, n_points=LIBRARY_POINTS):
+    """Hash of the files (paths and blob SHAs) and grid a library is built from."""
+    digest = hashlib.sha1(f'{instrument}:{n_points}'.encode())
+    for path, sha in sorted(zip(files['path'], files['sha'])):
+        digest.update(f'\n{path}:{sha}'.encode())
+    return digest.hexdigest()[:16]
+
+
+class SpectralLibrary:
+    """
+    Every spectrum of an instrument resampled to a common grid, for similarity search.
+
+    The resampled spectra are kept twice as rows of unit length, as they are (cosine) and
+    centred (Pearson correlation), so ranking the library against one spectrum is a single
+    matrix-vector product. Outside its own x range a spectrum counts as 0.
+    """
+
+    def __init__(self, paths, grid, matrices):
+        self.paths = list(paths)
+        self.grid = grid
+        self.matrices = matrices
+        self.positions = {path: position for position, path in enumerate(self.paths)}
+
+    @classmethod
+    def build(cls, spectra, n_points=LIBRARY_POINTS):
+        """
+        Parameters:
+        - spectra (dict): file path -> spectrum frame with x and y columns.
+        - n_points (int): Size of the common grid. Default = LIBRARY_POINTS
+
+        Returns:
+        - SpectralLibrary: The library.
+        """
+        paths = list(spectra)
+        if not paths:
+            empty = np.zeros((0, n_points), dtype=np.float32)
+            return cls(paths, np.array([]), {method: empty for method in METHODS})
+        grid, values = common_grid([(df['x'], df['y']) for df in spectra.values()], n_points)
+        return cls(paths, grid, {'cosine': unit_rows(values), 'correlation': unit_rows(values, center=True)})
+
+    def save(self, directory, name):
+        """Write the library as .npy files, replacing the older versions of the same instrument."""
+        os.makedirs(directory, exist_ok=True)
+        prefix = name.rsplit('-', 1)[0] + '-'
+        for file_name in os.listdir(directory):
+            if file_name.startswith(prefix) and not file_name.startswith(name):
+                os.remove(os.path.join(directory, file_name))
+        arrays = {'grid': self.grid, **self.matrices}
+        for key, array in arrays.items():
+            temporary = os.path.join(directory, f'{name}.{key}.tmp.npy')
+            np.save(temporary, array)
+            os.replace(temporary, os.path.join(directory, f'{name}.{key}.npy'))
+        # Written last, so its presence means the arrays are complete
+        with open(os.path.join(directory, f'{name}.json'), 'w') as file:
+            json.dump({'paths': self.paths}, file)
+
+    @classmethod
+    def load(cls, directory, name):
+        """The saved library, memory-mapped, or None if it isn't on disk."""
+        try:
+            with open(os.path.join(directory, f'{name}.json')) as file:
+                paths = json.load(file)['paths']
+            grid = np.load(os.path.join(directory, f'{name}.grid.npy'))
+            matrices = {method: np.load(os.path.join(directory, f'{name}.{method}.npy'), mmap_mode='r')
+                        for method in METHODS}
+        except (OSError, ValueError, KeyError):
+            return None
+        return cls(paths, grid, matrices)
+
+    def match(self, path, method='correlation', k=None):
+        """
+        Spectra of the library ranked by similarity to one of them.
+
+        Parameters:
+        - path (str): Repository path of the reference spectrum.
+        - method (str): 'correlation' or 'cosine'. Default = 'correlation'
+        - k (int): Number of matches to return. Default = None, all of them
+
+        Returns:
+        - pandas.DataFrame: path and score (1 is identical) of the other spectra, best first.
+        """
+        matrix = self.matrices[method]
+        position = self.positions[path]
+        scores = np.asarray(matrix @ matrix[position])
+        order = np.argsort(-scores, kind='stable')
+        order = order[order != position][:k]
+        return pd.DataFrame({'path': np.asarray(self.paths)[order], 'score': scores[order]})
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def open_library(instrument, version, paths):
+    name = f'{instrument}-{version}'
+    library = SpectralLibrary.load(LIBRARY_DIR, name)
+    if library is not None:
+        return library
+    with span('library.build', instrument=instrument, files=len(paths)):
+        spectra, errors = fetch_many(list(paths), read_spectrum)
+        for file_path, error in errors.items():
+            logger.warning("Left %s out of the %s library: %s", file_path, instrument, error)
+        library = SpectralLibrary.build(spectra)
+        library.save(LIBRARY_DIR, name)
+    # Reopened so every session reads the same memory-mapped arrays
+    return SpectralLibrary.load(LIBRARY_DIR, name)
+
+
+def spectral_library(instrument):
+    """
+    Spectral library of an instrument at the current head.
+
+    The library is versioned by the blob SHAs of its files: it is built once per version,
+    saved next to the disk mirror and memory-mapped from there afterwards.
+
+    Parameters:
+    - instrument (str): Instrument folder under acbc_database/data (e.g., 'infrared').
+
+    Returns:
+    - SpectralLibrary: The library of the instrument's spectra, every format with a reader.
+    """
+    files = get_file_index().query(instrument=instrument, extension=list(READERS))
+    return open_library(instrument, library_version(instrument, files), tuple(files['path']))
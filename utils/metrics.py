@@ -0,0 +1,63 @@
+import streamlit as st
+import numpy as np
+import pandas as pd
+
+ATOMIC_MASS = {'C': 12.011, 'H': 1.008, 'N': 14.007, 'O': 15.999}
+
+
+def as_float(series):
+    return series.to_numpy(dtype=float, na_value=np.nan)
+
+
+def fmt(values, spec='%.2f'):
+    """Format a float array element-wise in C, missing values as 'nan'."""
+    return np.char.mod(spec, values)
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def derived_metrics(master):
+    """
+    Derived properties of every sample, computed once per version of master.
+
+    st.cache_resource keys the result on the content hash of master, so every chart of the
+    dashboard reuses the same (read-only) frame until the inventory changes.
+
+    Parameters:
+    - master (pandas.DataFrame): The master inventory.
+
+    Returns:
+    - pandas.DataFrame: Indexed like master, with ShortName, LongName, Feedstock, PyrolysisType,
+      Capacity(mmol/g), BET(m2/g), the mass ratio (O+N)/C, the atomic ratios H/C, O/C, N/C and
+      (O+N)/C (atomic), and a hover label for the adsorption plot.
+    """
+    carbon = as_float(master['%C'])
+    hydrogen = as_float(master['%H'])
+    nitrogen = as_float(master['%N'])
+    oxygen = as_float(master['%O'])
+    capacity = as_float(master['Capacity(mmol/g)'])
+    bet = as_float(master['BET(m2/g)'])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mass_ratio = (oxygen + nitrogen) / carbon
+        carbon_moles = carbon / ATOMIC_MASS['C']
+        h_c = (hydrogen / ATOMIC_MASS['H']) / carbon_moles
+        o_c = (oxygen / ATOMIC_MASS['O']) / carbon_moles
+        n_c = (nitrogen / ATOMIC_MASS['N']) / carbon_moles
+
+    metrics = pd.DataFrame({
+        'ShortName': master['ShortName'],
+        'LongName': master['LongName'],
+        'Feedstock': master['Feedstock'],
+        'PyrolysisType': master['PyrolysisType'],
+        'Capacity(mmol/g)': capacity,
+        'BET(m2/g)': bet,
+        '(O+N)/C': mass_ratio,
+        'H/C': h_c,
+        'O/C': o_c,
+        'N/C': n_c,
+        '(O+N)/C (atomic)': o_c + n_c,
+    }, index=master.index)
+    metrics['label'] = (metrics['ShortName'].astype(str) + ': (' + fmt(capacity) + ',' + fmt(bet) + ','
+                        + fmt(mass_ratio) + ')')
+    metrics['vk_label'] = metrics['ShortName'].astype(str) + ': (' + fmt(o_c, '%.3f') + ',' + fmt(h_c, '%.3f') + ')'
+    return metrics
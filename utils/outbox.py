@@ -0,0 +1,243 @@
+import streamlit as st
+import hashlib
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import pandas as pd
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from utils.commits import CommitConflict, change_set, submission_settings
+from utils.perf import METRICS, count
+
+OUTBOX_PATH = submission_settings.get('outbox', '.cache/outbox.sqlite')
+BATCH_SECONDS = submission_settings.get('batch_seconds', 2.0)  # How long a delivery waits for more submissions
+BATCH_FILES = submission_settings.get('batch_files', 50)  # Most files delivered in one commit
+BACKOFF_SECONDS = (5.0, 600.0)  # First and longest wait before retrying a failed delivery
+MAX_DELIVERIES = submission_settings.get('max_deliveries', 12)  # Tries before a submission is marked failed
+
+logger = logging.getLogger(__name__)
+
+
+class Outbox:
+    """
+    Durable queue of the files waiting to be committed to the repository.
+
+    A submission is written to SQLite (WAL journal) before the page acknowledges it, so it
+    survives Forgejo being down and the app restarting. Its idempotency key is the hash of
+    its path and content: submitting the same file twice queues it once.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self.connect() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('''CREATE TABLE IF NOT EXISTS outbox (
+                              id INTEGER PRIMARY KEY AUTOINCREMENT,
+                              key TEXT UNIQUE,
+                              path TEXT,
+                              content BLOB,
+                              message TEXT,
+                              status TEXT,
+                              attempts INTEGER DEFAULT 0,
+                              created REAL,
+                              next_attempt REAL,
+                              delivered REAL,
+                              error TEXT)''')
+            db.execute('CREATE INDEX IF NOT EXISTS due ON outbox (status, next_attempt)')
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def enqueue(self, path, content, message):
+        """
+        Parameters:
+        - path (str): Repository path of the file.
+        - content (bytes): The file content.
+        - message (str): Why the file is submitted, used in the commit message.
+
+        Returns:
+        - str: The idempotency key of the submission.
+        """
+        key = hashlib.sha256(path.encode() + b'\0' + content).hexdigest()
+        now = time.time()
+        with self.connect() as db:
+            db.execute('''INSERT OR IGNORE INTO outbox (key, path, content, message, status, created, next_attempt)
+                          VALUES (?, ?, ?, ?, 'pending', ?, ?)''', (key, path, content, message, now, now))
+        return key
+
+    def due(self, limit=BATCH_FILES):
+        """Pending submissions whose next attempt is due, oldest first, as (id, path, content, message, attempts)."""
+        with self.connect() as db:
+            return db.execute('''SELECT id, path, content, message, attempts FROM outbox
+                                 WHERE status = 'pending' AND next_attempt <= ? ORDER BY id LIMIT ?''',
+                              (time.time(), limit)).fetchall()
+
+    def next_due(self):
+        """Time of the earliest pending attempt, or None if nothing is pending."""
+        with self.connect() as db:
+            return db.execute("SELECT MIN(next_attempt) FROM outbox WHERE status = 'pending'").fetchone()[0]
+
+    def delivered(self, ids):
+        now = time.time()
+        with self.connect() as db:
+            db.executemany("UPDATE outbox SET status = 'delivered', delivered = ?, content = NULL, error = NULL "
+                           "WHERE id = ?", [(now, id_) for id_ in ids])
+            for created, in db.execute(f"SELECT created FROM outbox WHERE id IN ({','.join('?' * len(ids))})", ids):
+                METRICS.observe('outbox.latency', now - created)
+
+    def retry_later(self, rows, error):
+        """Reschedule failed submissions with exponential backoff and jitter, or fail them for good."""
+        now = time.time()
+        with self.connect() as db:
+            for id_, *_, attempts in rows:
+                delay = min(BACKOFF_SECONDS[0] * 2 ** attempts, BACKOFF_SECONDS[1]) * random.uniform(0.8, 1.2)
+                status = 'failed' if attempts + 1 >= MAX_DELIVERIES else 'pending'
+                db.execute('UPDATE outbox SET status = ?, attempts = attempts + 1, next_attempt = ?, error = ? '
+                           'WHERE id = ?', (status, now + delay, error, id_))
+
+    def fail(self, ids, error):
+        """Fail submissions that can't be delivered by retrying, e.g. a file created by someone else."""
+        with self.connect() as db:
+            db.executemany("UPDATE outbox SET status = 'failed', attempts = attempts + 1, error = ? WHERE id = ?",
+                           [(error, id_) for id_ in ids])
+
+    def requeue(self, ids):
+        """Give failed submissions a fresh set of delivery attempts."""
+        with self.connect() as db:
+            db.executemany("UPDATE outbox SET status = 'pending', attempts = 0, next_attempt = ? "
+                           "WHERE id = ? AND status = 'failed'", [(time.time(), id_) for id_ in ids])
+
+    def stats(self, recent=200):
+        """
+        State of the queue, for the admin page.
+
+        Parameters:
+        - recent (int): How many of the latest submissions to list. Default = 200
+
+        Returns:
+        - dict: pending, failed and delivered counts, age of the oldest pending submission (s)
+          and p50/p95 delivery latency (s) of the recent deliveries.
+        - pandas.DataFrame: The latest submissions, without their content.
+        """
+        with self.connect() as db:
+            counts = dict(db.execute('SELECT status, COUNT(*) FROM outbox GROUP BY status').fetchall())
+            oldest = db.execute("SELECT MIN(created) FROM outbox WHERE status = 'pending'").fetchone()[0]
+            submissions = pd.read_sql_query(
+                'SELECT id, path, message, status, attempts, created, next_attempt, delivered, error '
+                'FROM outbox ORDER BY id DESC LIMIT ?', db, params=(recent,))
+        for column in ['created', 'next_attempt', 'delivered']:
+            submissions[column] = pd.to_datetime(submissions[column], unit='s')
+        latency = (submissions['delivered'] - submissions['created']).dt.total_seconds().dropna()
+        return {
+            'pending': counts.get('pending', 0),
+            'failed': counts.get('failed', 0),
+            'delivered': counts.get('delivered', 0),
+            'oldest pending (s)': time.time() - oldest if oldest else None,
+            'latency p50 (s)': latency.quantile(0.5) if len(latency) else None,
+            'latency p95 (s)': latency.quantile(0.95) if len(latency) else None,
+        }, submissions
+
+
+class OutboxWorker:
+    """
+    Background delivery of the outbox, one commit in flight for the process.
+
+    Commits to one branch can't usefully run in parallel (each moves the head the others
+    were based on), so the worker delivers everything that is due as one change set instead.
+    """
+
+    def __init__(self, outbox):
+        self.outbox = outbox
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+
+    def start(self, ctx):
+        self.wake.set()
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self.run, name='acbc-outbox', daemon=True)
+            add_script_run_ctx(self.thread, ctx)
+            self.thread.start()
+
+    def run(self):
+        while True:
+            next_due = self.outbox.next_due()
+            if next_due is None:
+                self.wake.wait()
+            elif next_due > time.time():
+                self.wake.wait(next_due - time.time())
+            self.wake.clear()
+            time.sleep(BATCH_SECONDS)  # Let the submissions of the same moment join the commit
+            try:
+                self.deliver()
+            except Exception as e:
+                logger.warning("Outbox delivery failed: %s", e)
+                time.sleep(BACKOFF_SECONDS[0])
+
+    def deliver(self):
+        rows = self.outbox.due()
+        # One submission per path and commit; later ones to the same path wait for the next commit
+        first = {}
+        for row in rows:
+            first.setdefault(row[1], row)
+        rows = list(first.values())
+        if not rows:
+            return
+        files = {path: content for _, path, content, _, _ in rows}
+        messages = list(dict.fromkeys(message for _, _, _, message, _ in rows))
+        message = messages[0] if len(messages) == 1 else \
+            f"{len(rows)} submissions\n\n" + '\n'.join(f"- {message}" for message in messages)
+        try:
+            ok, detail = change_set(files, message)
+        except CommitConflict as e:
+            # The other files of the batch stay due and go with the next commit
+            count('outbox.conflicts', len(e.paths))
+            logger.warning("Outbox submission(s) not delivered: %s", e)
+            self.outbox.fail([row[0] for row in rows if row[1] in e.paths], str(e))
+            return
+        except Exception as e:
+            ok, detail = False, f"Error: {e}"
+        if ok:
+            count('outbox.delivered', len(rows))
+            self.outbox.delivered([row[0] for row in rows])
+        else:
+            count('outbox.retries', len(rows))
+            logger.warning("Outbox delivery of %d file(s) will be retried: %s", len(rows), detail)
+            self.outbox.retry_later(rows, detail)
+
+
+@st.cache_resource
+def get_outbox():
+    return Outbox(OUTBOX_PATH)
+
+
+@st.cache_resource
+def get_outbox_worker():
+    return OutboxWorker(get_outbox())
+
+
+def start_delivery():
+    """Make sure the delivery worker runs, e.g. to pick up what a previous process left in the outbox."""
+    get_outbox_worker().start(get_script_run_ctx())
+
+
+def submit_file(path, content, message):
+    """
+    Queue a file for commit and return at once; the worker delivers it in the background.
+
+    Parameters:
+    - path (str): Repository path of the file.
+    - content (bytes): The file content.
+    - message (str): Why the file is submitted.
+
+    Returns:
+    - str: The idempotency key of the submission.
+    """
+    key = get_outbox().enqueue(path, content, message)
+    start_delivery()
+    return key
@@ -0,0 +1,116 @@
+import io
+import numpy as np
+import pandas as pd
+from utils.forgejo import read_parsed
+from utils.schema import COLUMN_RENAMES, REPOSITORY_NAMES
+
+PATCH_COLUMNS = ['ShortName', 'column', 'old', 'new']
+
+
+def as_text(values):
+    """Canonical text of a column's values, as they are written to the csv files (dates as YYYY-MM-DD)."""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.dt.strftime('%Y-%m-%d').astype('string')
+    return values.astype('string')
+
+
+def from_text(text, dtype):
+    """Parse canonical text back into a column dtype."""
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return pd.to_datetime(text, errors='coerce').astype(dtype)
+    if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+        return pd.to_numeric(text, errors='coerce').astype(dtype)
+    return text.astype('string')
+
+
+def diff_cells(before, after, key='ShortName'):
+    """
+    Cell-level patch between two versions of the same rows.
+
+    Both frames are compared column by column as canonical text, in one vectorized pass,
+    so the patch size follows the number of changed cells and not the size of the rows.
+
+    Parameters:
+    - before (pandas.DataFrame): The rows as they were, identified by key.
+    - after (pandas.DataFrame): The same rows, in the same order, after editing.
+    - key (str): Column identifying the samples. Default = 'ShortName'
+
+    Returns:
+    - pandas.DataFrame: One row per changed cell: ShortName (as before the edit), column, old and new
+      value as text (missing values as <NA>).
+    """
+    columns = [column for column in before.columns if column in after.columns]
+    old = pd.DataFrame({column: as_text(before[column]) for column in columns}).reset_index(drop=True)
+    new = pd.DataFrame({column: as_text(after[column]) for column in columns}).reset_index(drop=True)
+    changed = ~((old == new).fillna(False) | (old.isna() & new.isna()))
+    rows, positions = np.nonzero(changed.to_numpy())
+    return pd.DataFrame({
+        'ShortName': old[key].to_numpy()[rows],
+        'column': np.asarray(columns, dtype=object)[positions],
+        'old': old.to_numpy()[rows, positions],
+        'new': new.to_numpy()[rows, positions],
+    }).astype('string')
+
+
+def to_repository_patches(patches):
+    """Patches with the repository's column headers, for writing to a csv."""
+    return patches.assign(column=patches['column'].map(lambda column: REPOSITORY_NAMES.get(column, column)))
+
+
+def read_patches(file_path, sha=None):
+    """
+    Patch csv submitted to the repository, with the app's column names.
+
+    Parameters:
+    - file_path (str): Path to the patch csv in the repository.
+    - sha (str): Head SHA to validate against. Default = None, the current head
+
+    Returns:
+    - pandas.DataFrame: ShortName, column, old and new, as text.
+    """
+    patches = read_parsed(file_path, 'patch', lambda content: pd.read_csv(io.BytesIO(content), dtype='string'), sha)
+    return patches.assign(column=patches['column'].map(lambda column: COLUMN_RENAMES.get(column, column).strip()))
+
+
+def apply_patches(master, patches, key='ShortName'):
+    """
+    Merge a batch of cell patches into the inventory in one pass.
+
+    A patch applies only if its sample and column exist and the cell still holds the patch's old
+    value. Two patches giving different new values to the same cell conflict with each other.
+
+    Parameters:
+    - master (pandas.DataFrame): The inventory to patch.
+    - patches (pandas.DataFrame): ShortName, column, old and new, as text.
+    - key (str): Column identifying the samples. Default = 'ShortName'
+
+    Returns:
+    - pandas.DataFrame: The patched copy of master.
+    - pandas.DataFrame: The patches that were not applied, with the cell's current value and the reason.
+    """
+    patches = patches[PATCH_COLUMNS].astype('string').drop_duplicates(ignore_index=True)
+    positions = pd.Series(np.arange(len(master)), index=master[key].astype(str).to_numpy())
+    positions = positions[~positions.index.duplicated()]
+    rows = positions.reindex(patches[key].to_numpy()).to_numpy()
+
+    reason = pd.Series(pd.NA, index=patches.index, dtype='string')
+    current = pd.Series(pd.NA, index=patches.index, dtype='string')
+    reason[np.isnan(rows)] = 'unknown sample'
+    reason[reason.isna() & ~patches['column'].isin(master.columns)] = 'unknown column'
+    reason[reason.isna() & patches.duplicated([key, 'column'], keep=False)] = 'edited twice'
+    for column, group in patches[reason.isna()].groupby('column'):
+        current[group.index] = as_text(master[column].iloc[rows[group.index].astype(int)]).to_numpy()
+    unchanged = (current == patches['old']).fillna(False) | (current.isna() & patches['old'].isna())
+    reason[reason.isna() & ~unchanged] = 'changed since'
+
+    merged = master.copy()
+    applied = patches[reason.isna()]
+    for column, group in applied.groupby('column'):
+        values = from_text(group['new'], merged[column].dtype)
+        if isinstance(merged[column].dtype, pd.CategoricalDtype):
+            missing = values.dropna().unique()
+            merged[column] = merged[column].cat.add_categories(
+                [value for value in missing if value not in merged[column].cat.categories])
+        merged.iloc[rows[group.index].astype(int), merged.columns.get_loc(column)] = values.to_numpy()
+    left_out = reason.notna()
+    return merged, patches[left_out].assign(current=current[left_out], reason=reason[left_out])
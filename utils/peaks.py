@@ -0,0 +1,187 @@
+import streamlit as st
+import json
+import logging
+import os
+import threading
+import numpy as np
+import pandas as pd
+import requests
+from scipy.signal import find_peaks, peak_widths
+from utils.fileindex import SAMPLE_CODE, get_file_index
+from utils.forgejo import MIRROR_DIR, fetch_many
+from utils.perf import span
+from utils.readers import READERS, read_spectrum
+
+PEAK_DIR = os.path.join(MIRROR_DIR, 'peaks')
+INSTRUMENTS = ['infrared', 'x-ray']
+INVERTED = {'infrared'}  # Transmission spectra: the bands are dips
+MIN_PROMINENCE = 0.05  # Fraction of the spectrum's y range
+COLUMNS = ['path', 'sha', 'sample', 'position', 'height', 'width']
+
+logger = logging.getLogger(__name__)
+
+
+def detect_peaks(x, y, invert=False):
+    """
+    Peaks of one spectrum.
+
+    Parameters:
+    - x (array-like): X values, in any order.
+    - y (array-like): Y values.
+    - invert (bool): Look for dips instead, as in transmission spectra. Default = False
+
+    Returns:
+    - pandas.DataFrame: position (x), height (prominence) and width (full width at half
+      prominence, in x units) of every peak standing out by at least MIN_PROMINENCE of the y range.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    known = ~(np.isnan(x) | np.isnan(y))
+    order = np.argsort(x[known])
+    x, y = x[known][order], y[known][order]
+    signal = -y if invert else y
+    extent = np.ptp(signal) if len(signal) > 2 else 0.0
+    if not extent:
+        return pd.DataFrame({'position': [], 'height': [], 'width': []})
+    peaks, properties = find_peaks(signal, prominence=MIN_PROMINENCE * extent)
+    widths = peak_widths(signal, peaks, rel_height=0.5,
+                         prominence_data=(properties['prominences'], properties['left_bases'],
+                                          properties['right_bases']))[0]
+    return pd.DataFrame({'position': x[peaks], 'height': properties['prominences'],
+                         'width': widths * np.median(np.diff(x))})
+
+
+class PeakIndex:
+    """
+    Peaks of every spectrum of an instrument, sorted by position.
+
+    "Which samples have a band near 1700 cm-1" is two binary searches in the positions
+    instead of opening the files one by one.
+    """
+
+    def __init__(self, peaks):
+        self.peaks = peaks.sort_values('position', ignore_index=True)
+        self.positions = self.peaks['position'].to_numpy(dtype=float)
+
+    def between(self, low, high, master=None):
+        """
+        Peaks with low <= position <= high.
+
+        Parameters:
+        - low (float): Lower x bound.
+        - high (float): Upper x bound.
+        - master (pandas.DataFrame): Inventory to join on the sample code of the files. Default = None
+
+        Returns:
+        - pandas.DataFrame: path, sample, position, height and width of the peaks, by position,
+          with ShortName, Feedstock, PyrolysisType and Temp(C) when master is given.
+        """
+        start = np.searchsorted(self.positions, low, side='left')
+        stop = np.searchsorted(self.positions, high, side='right')
+        peaks = self.peaks.iloc[start:stop].drop(columns='sha')
+        if master is None:
+            return peaks
+        samples = master[['ShortName', 'Feedstock', 'PyrolysisType', 'Temp(C)']].assign(
+            sample=master['ShortName'].astype(str).str.extract(SAMPLE_CODE, expand=False))
+        return peaks.merge(samples, on='sample', how='left')
+
+
+class PeakIndexHolder:
+    """
+    Process-wide peak indexes, saved under the mirror directory and brought up to date by
+    processing only the files whose blob SHA is new.
+
+    Files that can't be parsed count as processed, without peaks, so they are not fetched
+    again until their blob SHA changes; files that failed to download are retried.
+    """
+
+    def __init__(self, directory=PEAK_DIR):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.indexes = {}    # instrument -> PeakIndex
+        self.processed = {}  # instrument -> {path: blob sha} of the files already processed
+
+    def load(self, instrument):
+        try:
+            peaks = pd.read_parquet(os.path.join(self.directory, f'{instrument}.parquet'))
+            with open(os.path.join(self.directory, f'{instrument}.json')) as file:
+                processed = json.load(file)
+        except (OSError, ValueError):
+            peaks, processed = pd.DataFrame(columns=COLUMNS).astype({'position': float}), {}
+        return peaks, processed
+
+    def save(self, instrument, peaks, processed):
+        os.makedirs(self.directory, exist_ok=True)
+        # Both files are written aside and moved in place, the progress file last
+        temporary = os.path.join(self.directory, f'{instrument}.parquet.tmp')
+        peaks.to_parquet(temporary, index=False)
+        os.replace(temporary, os.path.join(self.directory, f'{instrument}.parquet'))
+        temporary = os.path.join(self.directory, f'{instrument}.json.tmp')
+        with open(temporary, 'w') as file:
+            json.dump(processed, file)
+        os.replace(temporary, os.path.join(self.directory, f'{instrument}.json'))
+
+    def update(self, instrument, files):
+        """
+        Peak index of an instrument matching files, updated incrementally.
+
+        Parameters:
+        - instrument (str): Instrument folder under acbc_database/data.
+        - files (pandas.DataFrame): The instrument's files, from the file index (path, sha, sample).
+
+        Returns:
+        - PeakIndex: The index.
+        """
+        wanted = dict(zip(files['path'], files['sha']))
+        index = self.indexes.get(instrument)
+        if index is not None and self.processed[instrument] == wanted:
+            return index
+        with self.lock:
+            if instrument in self.indexes:
+                peaks, processed = self.indexes[instrument].peaks, self.processed[instrument]
+            else:
+                peaks, processed = self.load(instrument)
+            if processed == wanted and instrument in self.indexes:
+                return self.indexes[instrument]
+            previous = processed
+            stale = [path for path, sha in wanted.items() if processed.get(path) != sha]
+            # Rows of files that were deleted or changed since they were processed
+            peaks = peaks[peaks['path'].map(wanted) == peaks['sha']]
+            processed = {path: sha for path, sha in processed.items() if wanted.get(path) == sha}
+            with span('peaks.update', instrument=instrument, files=len(stale)):
+                spectra, errors = fetch_many(stale, read_spectrum)
+                samples = dict(zip(files['path'], files['sample']))
+                found = [detect_peaks(df['x'], df['y'], instrument in INVERTED).assign(
+                             path=path, sha=wanted[path], sample=samples[path])
+                         for path, df in spectra.items()]
+            for file_path, error in errors.items():
+                logger.warning("Peaks of %s not indexed: %s", file_path, error)
+            unreadable = [path for path, error in errors.items() if not isinstance(error, requests.RequestException)]
+            processed.update({path: wanted[path] for path in [*spectra, *unreadable]})
+            peaks = pd.concat([peaks] + found, ignore_index=True)[COLUMNS]
+            if processed != previous:
+                self.save(instrument, peaks, processed)
+            self.indexes[instrument] = PeakIndex(peaks)
+            self.processed[instrument] = processed
+            return self.indexes[instrument]
+
+
+@st.cache_resource
+def get_peak_holder():
+    return PeakIndexHolder()
+
+
+def peak_index(instrument, files=None):
+    """
+    Peak index of an instrument's spectra at the current head.
+
+    Parameters:
+    - instrument (str): Instrument folder under acbc_database/data (e.g., 'infrared').
+    - files (pandas.DataFrame): The instrument's files. Default = None, from the current file index
+
+    Returns:
+    - PeakIndex: The index.
+    """
+    if files is None:
+        files = get_file_index().query(instrument=instrument, extension=list(READERS))
+    return get_peak_holder().update(instrument, files)
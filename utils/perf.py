@@ -0,0 +1,133 @@
+import streamlit as st
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from functools import wraps
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger('acbc.perf')
+
+# Optional [perf] section of secrets.toml; log = true writes every span to stderr as a JSON line
+perf_settings = st.secrets.get('perf', {})
+if perf_settings.get('log', False) and not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+SAMPLES_PER_STAGE = 1000  # Durations kept per stage for the percentiles
+
+
+class Metrics:
+    """
+    Process-wide timings and counters of the app's hot paths.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.durations = defaultdict(lambda: deque(maxlen=SAMPLES_PER_STAGE))
+        self.totals = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(float)
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            self.durations[stage].append(seconds)
+            self.totals[stage] += seconds
+            self.calls[stage] += 1
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+
+    def snapshot(self):
+        """
+        Returns:
+        - pandas.DataFrame: One row per stage with its calls and p50/p95/max duration in ms.
+        - dict: Counter name -> value.
+        """
+        with self.lock:
+            durations = {stage: np.array(samples) for stage, samples in self.durations.items()}
+            calls = dict(self.calls)
+            counters = dict(self.counters)
+        rows = [{'stage': stage,
+                 'calls': calls[stage],
+                 'p50 (ms)': np.percentile(samples, 50) * 1000,
+                 'p95 (ms)': np.percentile(samples, 95) * 1000,
+                 'max (ms)': samples.max() * 1000}
+                for stage, samples in sorted(durations.items())]
+        return pd.DataFrame(rows, columns=['stage', 'calls', 'p50 (ms)', 'p95 (ms)', 'max (ms)']), counters
+
+    def prometheus(self):
+        """
+        Returns:
+        - str: The metrics in the Prometheus text exposition format.
+        """
+        with self.lock:
+            durations = {stage: np.array(samples) for stage, samples in self.durations.items()}
+            totals = dict(self.totals)
+            calls = dict(self.calls)
+            counters = dict(self.counters)
+        lines = ['# TYPE acbc_stage_seconds summary']
+        for stage, samples in sorted(durations.items()):
+            for quantile in (0.5, 0.95):
+                lines.append(f'acbc_stage_seconds{{stage="{stage}",quantile="{quantile}"}} '
+                             f'{np.quantile(samples, quantile):.6f}')
+            lines.append(f'acbc_stage_seconds_sum{{stage="{stage}"}} {totals[stage]:.6f}')
+            lines.append(f'acbc_stage_seconds_count{{stage="{stage}"}} {calls[stage]}')
+        for name, value in sorted(counters.items()):
+            metric = 'acbc_' + name.replace('.', '_') + '_total'
+            lines.append(f'# TYPE {metric} counter')
+            lines.append(f'{metric} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = Metrics()
+
+
+@contextmanager
+def span(stage, **fields):
+    """
+    Time a block of code as one stage.
+
+    Every span is recorded in METRICS and logged as one JSON line on the 'acbc.perf' logger.
+
+    Parameters:
+    - stage (str): Name of the stage (e.g., 'http.get').
+    - fields: Extra values added to the log line.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        METRICS.observe(stage, seconds)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({'stage': stage, 'ms': round(seconds * 1000, 3), **fields}, default=str))
+
+
+def timed(stage):
+    """Decorator version of span."""
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, value=1):
+    """
+    Add to a counter (e.g., 'cache.mirror.hit' or 'http.bytes').
+
+    Parameters:
+    - name (str): Name of the counter.
+    - value (float): Amount to add. Default = 1
+    """
+    METRICS.count(name, value)
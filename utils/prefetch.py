@@ -0,0 +1,84 @@
+import streamlit as st
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from utils.fileindex import load_file_index
+from utils.forgejo import HEAD_POLL_SECONDS, fetch_bytes, get_head_poller, get_mirror, get_session, head_sha
+from utils.inventory import MASTER_PATH, NAMING_KEY_PATH, UCD_PATH, get_shared_frames, read_inventory_csv
+from utils.peaks import INSTRUMENTS, get_peak_holder, peak_index
+from utils.readers import READERS
+
+logger = logging.getLogger(__name__)
+
+
+class Prefetcher:
+    """
+    Background warm-up of the shared caches, at most one run per HEAD_POLL_SECONDS for the process.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread = None
+        self.started_at = 0.0
+
+    def start(self, ctx):
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            if time.monotonic() - self.started_at < HEAD_POLL_SECONDS:
+                return
+            self.started_at = time.monotonic()
+            self.thread = threading.Thread(target=self.run, name='acbc-prefetch', daemon=True)
+            add_script_run_ctx(self.thread, ctx)
+            self.thread.start()
+
+    def run(self):
+        try:
+            sha = head_sha()
+        except Exception as e:
+            logger.warning("Prefetch skipped, the repository can't be reached: %s", e)
+            return
+        frames = get_shared_frames()
+        tasks = {
+            'master': lambda: frames.get(MASTER_PATH, sha, read_inventory_csv),
+            'UC Davis database': lambda: frames.get(UCD_PATH, sha, read_inventory_csv),
+            'naming keys': lambda: fetch_bytes(NAMING_KEY_PATH, sha),
+            'file index': lambda: load_file_index(sha),
+        }
+        with ThreadPoolExecutor(max_workers=len(tasks), initializer=add_script_run_ctx,
+                                initargs=(None, get_script_run_ctx())) as executor:
+            futures = {name: executor.submit(task) for name, task in tasks.items()}
+        for name, future in futures.items():
+            if future.exception() is not None:
+                logger.warning("Prefetch of %s failed: %s", name, future.exception())
+        # Peaks of the new or changed spectra, once the file index is there
+        if futures['file index'].exception() is None:
+            for instrument in INSTRUMENTS:
+                try:
+                    peak_index(instrument, futures['file index'].result().query(instrument=instrument, extension=list(READERS)))
+                except Exception as e:
+                    logger.warning("Peak indexing of %s failed: %s", instrument, e)
+
+
+@st.cache_resource
+def get_prefetcher():
+    return Prefetcher()
+
+
+def prefetch():
+    """
+    Start loading the inventory, the naming keys and the file index in the background,
+    then index the peaks of the new or changed spectra.
+
+    Call it right after login: the pages then find them in the shared caches instead of
+    waiting on the repository one after the other. Returns immediately.
+    """
+    # Create the shared resources here, so the background threads only ever hit their caches
+    get_session()
+    get_mirror()
+    get_head_poller()
+    get_shared_frames()
+    get_peak_holder()
+    get_prefetcher().start(get_script_run_ctx())
@@ -0,0 +1,146 @@
+import streamlit as st
+import numpy as np
+from numpy.polynomial import polynomial
+from scipy.signal import savgol_filter
+from utils.forgejo import fetch_many
+from utils.perf import span
+from utils.readers import read_spectrum
+from utils.spectra import common_grid
+
+BASELINES = ['none', 'linear', 'polynomial']
+NORMALIZATIONS = ['none', 'max', 'min-max', 'snv', 'area']
+BASELINE_ITERATIONS = 50
+
+# Every step off: the spectra are returned as they are
+DEFAULT_PIPELINE = {
+    'x_range': None,       # (low, high) x bounds to keep
+    'baseline': 'none',    # One of BASELINES
+    'degree': 3,           # Degree of the polynomial baseline
+    'window': 1,           # Savitzky-Golay window in points, 1 for no smoothing
+    'derivative': 0,       # 0, 1 or 2
+    'normalize': 'none',   # One of NORMALIZATIONS
+}
+
+
+def pipeline_key(params):
+    """Hashable, order-independent form of pipeline parameters, for caching."""
+    params = {**DEFAULT_PIPELINE, **(params or {})}
+    return tuple(sorted((name, tuple(value) if isinstance(value, (list, tuple)) else value)
+                        for name, value in params.items()))
+
+
+def fill_edges(values):
+    """Replace the NaN of each row by the nearest known value of the row, so filters see no gaps."""
+    known = ~np.isnan(values)
+    columns = np.arange(values.shape[1])
+    previous = np.maximum.accumulate(np.where(known, columns, -1), axis=1)
+    following = np.minimum.accumulate(np.where(known, columns, len(columns))[:, ::-1], axis=1)[:, ::-1]
+    nearest = np.clip(np.where(previous >= 0, previous, following), 0, len(columns) - 1)
+    return np.nan_to_num(np.take_along_axis(values, nearest, axis=1), nan=0.0)
+
+
+def polynomial_baseline(x, values, degree, iterations=BASELINE_ITERATIONS):
+    """
+    Baseline of every row by iterative polynomial fitting (ModPoly): points above the fit
+    are clipped to it and the fit repeated, so peaks stop pulling the baseline up.
+    All the rows are fitted together, through the pseudo-inverse of the Vandermonde matrix.
+    """
+    scaled = (x - x.mean()) / (np.ptp(x) or 1.0)  # Keeps the Vandermonde matrix well conditioned
+    vandermonde = polynomial.polyvander(scaled, degree)
+    solve = np.linalg.pinv(vandermonde).T  # values @ solve are the least squares coefficients
+    target = values
+    for _ in range(iterations):
+        baseline = (target @ solve) @ vandermonde.T
+        target = np.minimum(target, baseline)
+    return baseline
+
+
+def preprocess(x, values, params=None):
+    """
+    Run the preprocessing pipeline on spectra sharing one x grid.
+
+    The steps run in order crop, baseline correction, Savitzky-Golay smoothing, derivative and
+    normalization, each as one array operation over all the spectra.
+
+    Parameters:
+    - x (numpy.ndarray): The increasing x grid, shape (n_points,).
+    - values (numpy.ndarray): One spectrum per row, shape (n_spectra, n_points). NaN where a spectrum has no data.
+    - params (dict): Pipeline parameters, see DEFAULT_PIPELINE. Default = None, every step off
+
+    Returns:
+    - numpy.ndarray: The cropped x grid.
+    - numpy.ndarray: The processed spectra, NaN where the input was.
+    """
+    params = {**DEFAULT_PIPELINE, **(params or {})}
+    x = np.asarray(x, dtype=float)
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    if params['x_range'] is not None:
+        keep = (x >= params['x_range'][0]) & (x <= params['x_range'][1])
+        x, values = x[keep], values[:, keep]
+    if len(x) < 2:
+        return x, values
+    missing = np.isnan(values)
+    values = fill_edges(values)
+
+    if params['baseline'] == 'linear':
+        slope = (values[:, -1:] - values[:, :1]) / (x[-1] - x[0])
+        values = values - (values[:, :1] + slope * (x - x[0]))
+    elif params['baseline'] == 'polynomial':
+        values = values - polynomial_baseline(x, values, params['degree'])
+
+    window = min(params['window'], len(x) - (len(x) % 2 == 0))  # Odd and no longer than the spectra
+    spacing = (x[-1] - x[0]) / (len(x) - 1)
+    if window > 2:
+        # Smoothing and derivative in one Savitzky-Golay pass
+        values = savgol_filter(values, window, 2, deriv=params['derivative'], delta=spacing, axis=1)
+    else:
+        for _ in range(params['derivative']):
+            values = np.gradient(values, x, axis=1)
+
+    if params['normalize'] == 'max':
+        scale = np.abs(values).max(axis=1, keepdims=True)
+        values = values / np.where(scale > 0, scale, 1.0)
+    elif params['normalize'] == 'min-max':
+        low = values.min(axis=1, keepdims=True)
+        extent = values.max(axis=1, keepdims=True) - low
+        values = (values - low) / np.where(extent > 0, extent, 1.0)
+    elif params['normalize'] == 'snv':
+        spread = values.std(axis=1, keepdims=True)
+        values = (values - values.mean(axis=1, keepdims=True)) / np.where(spread > 0, spread, 1.0)
+    elif params['normalize'] == 'area':
+        area = np.trapezoid(np.abs(values), x, axis=1)[:, None]
+        values = values / np.where(area > 0, area, 1.0)
+
+    values[missing] = np.nan
+    return x, values
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def preprocessed_spectra(files, pipeline):
+    """
+    Fetch and preprocess spectra, cached per (blob SHAs of the files, pipeline parameters).
+
+    A changed file gets a new blob SHA and so a new entry, and switching an option back
+    reuses the earlier result without fetching or processing anything.
+
+    Parameters:
+    - files (tuple): (path, blob sha) pairs of the spectra.
+    - pipeline (tuple): Pipeline parameters, from pipeline_key.
+
+    Returns:
+    - numpy.ndarray: The x grid, the file's own x values when there is a single spectrum.
+    - numpy.ndarray: The processed spectra, one row per readable file.
+    - list: Paths of the rows.
+    - dict: path -> error message, for the files that couldn't be read.
+    """
+    spectra, errors = fetch_many([path for path, _ in files], read_spectrum)
+    if not spectra:
+        return np.array([]), np.empty((0, 0)), [], {path: str(error) for path, error in errors.items()}
+    with span('preprocess', spectra=len(spectra)):
+        if len(spectra) == 1:
+            df = next(iter(spectra.values())).sort_values('x')
+            grid, values = df['x'].to_numpy(dtype=float), df['y'].to_numpy(dtype=float)[None, :]
+        else:
+            grid, values = common_grid([(df['x'], df['y']) for df in spectra.values()])
+        grid, values = preprocess(grid, values, dict(pipeline))
+    return grid, values, list(spectra), {path: str(error) for path, error in errors.items()}
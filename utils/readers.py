@@ -0,0 +1,166 @@
+import io
+import re
+import struct
+from functools import partial
+import numpy as np
+import pandas as pd
+from utils.forgejo import read_parsed
+
+NUMBER = re.compile(rb'[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?')
+
+# Extension -> function turning the raw bytes of a file into (x, y) float arrays
+READERS = {}
+
+
+def register(*extensions):
+    """
+    Register a spectrum reader for file extensions (without the dot).
+
+    Parameters:
+    - extensions (str): The extensions the reader handles.
+    """
+    def decorator(reader):
+        for extension in extensions:
+            READERS[extension] = reader
+        return reader
+    return decorator
+
+
+# The tables are read as exactly two named columns, so header lines of any width don't upset the tokenizer
+def columns_xy(df):
+    """First two columns of a parsed table as floats, without the rows that aren't numbers (headers)."""
+    values = df.iloc[:, :2].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    values = values[~np.isnan(values).any(axis=1)]
+    return values[:, 0], values[:, 1]
+
+
+@register('csv')
+def read_csv_xy(content):
+    """Two-column csv, header line optional, parsed by the C tokenizer straight from the bytes."""
+    return columns_xy(pd.read_csv(io.BytesIO(content), names=[0, 1], usecols=[0, 1], engine='c'))
+
+
+def read_whitespace_xy(content, comment='#'):
+    """Whitespace separated x y columns (diffractometer exports), header and comment lines skipped."""
+    return columns_xy(pd.read_csv(io.BytesIO(content), names=[0, 1], usecols=[0, 1], sep=r'\s+', comment=comment,
+                                  engine='c'))
+
+
+register('xy', 'txt', 'dat')(read_whitespace_xy)
+# Rigaku .ras headers are '*' lines
+register('ras')(partial(read_whitespace_xy, comment='*'))
+
+
+def jcamp_labels(content):
+    """##LABEL=value records of a JCAMP-DX file, labels upper-cased without spaces."""
+    return {match[1].upper().replace(b' ', b'').decode(): match[2].strip()
+            for match in re.finditer(rb'^##([^=]+)=(.*)$', content, flags=re.MULTILINE)}
+
+
+@register('jdx', 'dx', 'jcamp')
+def read_jcamp(content):
+    """
+    JCAMP-DX spectrum in AFFN (plain numbers) form, either (X++(Y..Y)) or (XY..XY) data.
+
+    The compressed ASDF forms (SQZ, DIF, DUP characters) are not supported.
+    """
+    labels = jcamp_labels(content)
+    x_factor = float(labels.get('XFACTOR', 1) or 1)
+    y_factor = float(labels.get('YFACTOR', 1) or 1)
+    start = re.search(rb'^##(XYDATA|XYPOINTS|PEAKTABLE)=\s*\(([^)]*\))[^\n]*\n', content, flags=re.MULTILINE)
+    if start is None:
+        raise ValueError("No XYDATA, XYPOINTS or PEAK TABLE record in the JCAMP-DX file")
+    end = content.find(b'##', start.end())
+    block = content[start.end():end if end != -1 else len(content)]
+    if re.search(rb'[@A-DF-Za-df-s%]', block):  # E/e are exponents of AFFN numbers
+        raise ValueError("Compressed (ASDF) JCAMP-DX data is not supported")
+
+    if b'..' in start[2] and b'++' not in start[2]:
+        # (XY..XY): x, y pairs
+        pairs = np.array(NUMBER.findall(block), dtype=float)
+        return pairs[0::2] * x_factor, pairs[1::2] * y_factor
+
+    # (X++(Y..Y)): each line is an x followed by the y values from that x on
+    rows = [np.array(NUMBER.findall(line), dtype=float) for line in block.splitlines()]
+    rows = [row for row in rows if len(row) > 1]
+    y = np.concatenate([row[1:] for row in rows]) * y_factor
+    if {'FIRSTX', 'LASTX'} <= labels.keys():
+        x = np.linspace(float(labels['FIRSTX']), float(labels['LASTX']), len(y))
+    else:
+        line_x = np.repeat([row[0] for row in rows], [len(row) - 1 for row in rows]) * x_factor
+        step = (rows[-1][0] - rows[0][0]) * x_factor / max(len(y) - len(rows[-1]) + 1, 1)
+        offsets = np.concatenate([np.arange(len(row) - 1) for row in rows])
+        x = line_x + offsets * step
+    return x, y
+
+
+@register('spc')
+def read_spc(content):
+    """
+    Thermo Galactic SPC file (new, little-endian format), first subfile.
+
+    The y values are either float32 or int32 scaled by the file's exponent, and x is evenly
+    spaced between the first and last x unless the file carries its own x array.
+    """
+    flags, version = content[0], content[1]
+    if version != 0x4B:
+        raise ValueError(f"Unsupported SPC version 0x{version:02X}, only the new little-endian format is read")
+    exponent = struct.unpack_from('<b', content, 3)[0]
+    n_points = struct.unpack_from('<i', content, 4)[0]
+    first_x, last_x = struct.unpack_from('<dd', content, 8)
+    offset = 512
+    if flags & 0x80:  # TXVALS, an explicit x array follows the header
+        x = np.frombuffer(content, dtype='<f4', count=n_points, offset=offset).astype(float)
+        offset += 4 * n_points
+    else:
+        x = np.linspace(first_x, last_x, n_points)
+    sub_exponent = struct.unpack_from('<b', content, offset + 1)[0]
+    exponent = sub_exponent if exponent == 0 and sub_exponent else exponent
+    offset += 32  # Subfile header
+    if exponent == -128:
+        y = np.frombuffer(content, dtype='<f4', count=n_points, offset=offset).astype(float)
+    elif flags & 0x01:  # 16-bit integer y values
+        y = np.frombuffer(content, dtype='<i2', count=n_points, offset=offset) * 2.0 ** (exponent - 16)
+    else:
+        y = np.frombuffer(content, dtype='<i4', count=n_points, offset=offset) * 2.0 ** (exponent - 32)
+    return x, y
+
+
+def extension_of(file_path):
+    return file_path.rsplit('.', 1)[-1].lower() if '.' in file_path.rsplit('/', 1)[-1] else ''
+
+
+def parse_spectrum(content, extension):
+    """
+    Parse the raw bytes of a spectrum with the reader registered for its extension.
+
+    Parameters:
+    - content (bytes): The file content.
+    - extension (str): File extension, without the dot.
+
+    Returns:
+    - pandas.DataFrame: x and y columns, in file order.
+
+    Raises:
+    - ValueError: If no reader handles the extension or the file can't be parsed.
+    """
+    if extension not in READERS:
+        raise ValueError(f"No reader for .{extension} files")
+    x, y = READERS[extension](content)
+    return pd.DataFrame({'x': x, 'y': y})
+
+
+def read_spectrum(file_path, sha=None):
+    """
+    Spectrum of a repository file, parsed by its extension's reader and mirrored as Parquet.
+
+    Parameters:
+    - file_path (str): Path to the file in the repository.
+    - sha (str): Head SHA to validate against. Default = None, the current head
+
+    Returns:
+    - pandas.DataFrame: x and y columns.
+    """
+    extension = extension_of(file_path)
+    return read_parsed(file_path, f'spectrum-{extension}', lambda content: parse_spectrum(content, extension), sha)
+
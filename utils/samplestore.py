@@ -0,0 +1,91 @@
+import streamlit as st
+import numpy as np
+
+INDEXED_COLUMNS = ['ShortName', 'Feedstock', 'GroupLab', 'PyrolysisType']
+
+
+class SampleStore:
+    """
+    Indexed, read-only view of the master inventory.
+
+    ShortName, Feedstock, GroupLab and PyrolysisType map each value to the row positions holding
+    it, and Temp(C) is kept sorted, so lookups cost O(k) in the number of matching rows instead
+    of a scan of the whole table.
+    """
+
+    def __init__(self, master):
+        self.master = master
+        self.indexes = {column: {str(value): positions for value, positions in
+                                 master.groupby(master[column].astype(str), sort=False).indices.items()}
+                        for column in INDEXED_COLUMNS if column in master.columns}
+        temps = master['Temp(C)'].to_numpy(dtype=float, na_value=np.nan)
+        known = np.flatnonzero(~np.isnan(temps))
+        order = known[np.argsort(temps[known], kind='stable')]
+        self.temp_positions = order
+        self.temp_sorted = temps[order]
+
+    def positions(self, column, values):
+        """Row positions holding any of values in an indexed column, in the order of values."""
+        index = self.indexes[column]
+        found = [index[str(value)] for value in values if str(value) in index]
+        return np.concatenate(found) if found else np.array([], dtype=int)
+
+    def temp_positions_between(self, low=None, high=None):
+        """Row positions with low <= Temp(C) <= high, from two binary searches."""
+        start = 0 if low is None else np.searchsorted(self.temp_sorted, low, side='left')
+        stop = len(self.temp_sorted) if high is None else np.searchsorted(self.temp_sorted, high, side='right')
+        return self.temp_positions[start:stop]
+
+    def rows(self, short_names, columns=None):
+        """
+        Rows of the selected samples, in the order they were selected.
+
+        Parameters:
+        - short_names (list): The selected ShortNames.
+        - columns (list): Columns to return. Default = None, all of them
+
+        Returns:
+        - pandas.DataFrame: The selected rows.
+        """
+        selected = self.master.iloc[self.positions('ShortName', short_names)]
+        return selected if columns is None else selected[columns]
+
+    def query(self, columns=None, temp_range=None, **predicates):
+        """
+        Rows matching every predicate, e.g. query(Feedstock=['Crabshell'], temp_range=(400, 600)).
+
+        Parameters:
+        - columns (list): Columns to return. Default = None, all of them
+        - temp_range (tuple): (low, high) bounds of Temp(C), either may be None. Default = None
+        - predicates: Indexed column name -> accepted values (a list, or a single value).
+
+        Returns:
+        - pandas.DataFrame: The matching rows, in inventory order.
+        """
+        selected = None
+        for column, values in predicates.items():
+            values = values if isinstance(values, (list, tuple, set)) else [values]
+            positions = self.positions(column, values)
+            selected = positions if selected is None else np.intersect1d(selected, positions)
+        if temp_range is not None:
+            positions = self.temp_positions_between(*temp_range)
+            selected = positions if selected is None else np.intersect1d(selected, positions)
+        if selected is None:
+            result = self.master
+        else:
+            result = self.master.iloc[np.sort(selected)]
+        return result if columns is None else result[columns]
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def sample_store(master):
+    """
+    SampleStore of a master inventory, built once per version (content hash) of master.
+
+    Parameters:
+    - master (pandas.DataFrame): The master inventory.
+
+    Returns:
+    - SampleStore: The indexed inventory.
+    """
+    return SampleStore(master)
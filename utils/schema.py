@@ -0,0 +1,177 @@
+import pandas as pd
+from datetime import date
+
+# Headers of the repository csv files that don't match the names used across the app
+COLUMN_RENAMES = {
+    'Density ': 'Density',
+    'Hydrophobicity ': 'Hydrophobicity',
+    'Yield (%)': 'Yield(%)',
+}
+REPOSITORY_NAMES = {value: key for key, value in COLUMN_RENAMES.items()}
+
+# Declared dtypes of the master inventory
+MASTER_SCHEMA = {
+    'ProjectCode': 'category',
+    'ShortName': 'string',
+    'LongName': 'string',
+    'ParentSample': 'string',
+    'DateProduced': 'datetime64[ns]',
+    'Feedstock': 'category',
+    'Researcher/Student': 'category',
+    'GroupLab': 'category',
+    'PyrolysisType': 'category',
+    'Temp(C)': 'Float64',
+    'ProcessDetails': 'string',
+    'UnitType': 'category',
+    'Capacity(mmol/g)': 'Float64',
+    'Static/Dynamic': 'category',
+    'BET(m2/g)': 'Float64',
+    'pH': 'Float64',
+    'Yield(%)': 'Float64',
+    'PoreSize(nm)': 'Float64',
+    'PoreVolume(cm3/g)': 'Float64',
+    '%C': 'Float64',
+    '%H': 'Float64',
+    '%N': 'Float64',
+    '%O': 'Float64',
+    'Density': 'Float64',
+    'Hydrophobicity': 'Float64',
+    'Notes': 'string',
+    'Published?': 'string',
+}
+
+SHORT_NAME_PATTERN = r'[A-Z]{3}\d{4}_[A-Z]{2}\d{3}'  # XXX####_XX###, see the naming docs
+
+# Entry rules of the inventory columns, shared by the data editors and the validator.
+# kind: text, number, date, select or link. locked: read-only when editing existing samples.
+# naming: naming_key.json section -> regex extracting the code from the value that must be one of its keys.
+INVENTORY_FIELDS = {
+    'ProjectCode': {'kind': 'text', 'disabled': True, 'help': 'Automatically added'},
+    'ShortName': {'kind': 'text', 'help': 'XXX####_XX###', 'max_chars': 13, 'required': True,
+                  'pattern': SHORT_NAME_PATTERN, 'unique': True,
+                  'naming': {'researcher_initials': r'^([A-Z]{3})', 'feedstock': r'_([A-Z]{2})'}},
+    'LongName': {'kind': 'text', 'help': 'Max 30 chars', 'max_chars': 30},
+    'DateProduced': {'kind': 'date', 'min_value': date(1980, 1, 1), 'format': 'YYYY-MM-DD', 'required': True,
+                     'locked': True},
+    'Feedstock': {'kind': 'text', 'help': 'Max 30 chars', 'max_chars': 30, 'required': True},
+    'Researcher/Student': {'kind': 'text', 'help': 'Max 30 chars', 'max_chars': 30, 'required': True},
+    'GroupLab': {'kind': 'select', 'options': ['Hawboldt', 'McGuire', 'Poduska'], 'required': True},
+    'PyrolysisType': {'kind': 'select', 'options': ['Fast', 'Slow'], 'required': True},
+    'Temp(C)': {'kind': 'number', 'min_value': -273.15, 'required': True},
+    'ProcessDetails': {'kind': 'text', 'max_chars': 100, 'required': True,
+                       'help': 'rate: #deg/min, temp: #deg, hold: #min | rate:nat-cooling, temp:room'},
+    'UnitType': {'kind': 'text', 'help': 'US', 'max_chars': 5, 'required': True},
+    'Capacity(mmol/g)': {'kind': 'number'},
+    'Static/Dynamic': {'kind': 'select', 'options': ['Static', 'Dynamic']},
+    'BET(m2/g)': {'kind': 'number'},
+    'pH': {'kind': 'number', 'min_value': 0, 'max_value': 14},
+    'Yield(%)': {'kind': 'number'},
+    'PoreSize(nm)': {'kind': 'number'},
+    'PoreVolume(cm3/g)': {'kind': 'number'},
+    '%C': {'kind': 'number', 'min_value': 0, 'max_value': 100},
+    '%H': {'kind': 'number', 'min_value': 0, 'max_value': 100},
+    '%N': {'kind': 'number', 'min_value': 0, 'max_value': 100},
+    '%O': {'kind': 'number', 'min_value': 0, 'max_value': 100},
+    'Density': {'kind': 'number'},
+    'Hydrophobicity': {'kind': 'number'},
+    'Notes': {'kind': 'text', 'help': 'Short description (Max 50 charts)', 'max_chars': 50, 'locked': True},
+    'Published?': {'kind': 'link', 'help': 'DOI link', 'validate': r'^https://.+$', 'locked': True},
+}
+
+CATEGORY_MAX_RATIO = 0.5  # Undeclared text columns with fewer distinct values per row become categoricals
+
+
+def normalize_columns(df):
+    """
+    Strip the headers and rename the awkward ones (e.g., 'Yield (%)' -> 'Yield(%)').
+
+    Parameters:
+    - df (pandas.DataFrame): Frame as read from the repository.
+
+    Returns:
+    - pandas.DataFrame: The same frame with normalized headers.
+    """
+    df = df.rename(columns=COLUMN_RENAMES)
+    return df.rename(columns=lambda column: column.strip() if isinstance(column, str) else column)
+
+
+def apply_schema(df, schema=None):
+    """
+    Cast a frame read from the repository to its declared dtypes.
+
+    Declared columns get their schema dtype, text is stripped before becoming categorical and
+    unparseable numbers or dates become missing values. Undeclared columns are kept, with
+    low-cardinality text turned into categoricals and floats into nullable floats.
+
+    Parameters:
+    - df (pandas.DataFrame): Frame as read from the repository.
+    - schema (dict): Column name to dtype. Default = None, infer every column
+
+    Returns:
+    - pandas.DataFrame: The typed frame.
+    """
+    df = normalize_columns(df)
+    schema = schema or {}
+    typed = {}
+    for column in df.columns:
+        values = df[column]
+        dtype = schema.get(column)
+        if dtype is None:
+            if pd.api.types.is_float_dtype(values):
+                dtype = 'Float64'
+            elif pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values):
+                distinct = values.nunique(dropna=True)
+                dtype = 'category' if distinct <= CATEGORY_MAX_RATIO * max(len(values), 1) else 'string'
+            else:
+                typed[column] = values
+                continue
+
+        if dtype == 'category':
+            typed[column] = values.astype('string').str.strip().astype('category')
+        elif dtype == 'string':
+            typed[column] = values.astype('string')
+        elif dtype.startswith('datetime'):
+            typed[column] = pd.to_datetime(values, errors='coerce')
+        else:
+            typed[column] = pd.to_numeric(values, errors='coerce').astype(dtype)
+    return pd.DataFrame(typed, index=df.index)
+
+
+def to_repository_columns(df):
+    """
+    Undo normalize_columns so submitted csv files keep the repository headers.
+
+    Parameters:
+    - df (pandas.DataFrame): Frame with the app's column names.
+
+    Returns:
+    - pandas.DataFrame: The frame with the repository's column names.
+    """
+    return df.rename(columns=REPOSITORY_NAMES)
+
+
+def editable(df):
+    """
+    Plain-dtype copy of a typed frame for st.data_editor, which can't edit categoricals freely.
+
+    Parameters:
+    - df (pandas.DataFrame): A typed frame.
+
+    Returns:
+    - pandas.DataFrame: The frame with categorical columns turned back into text.
+    """
+    categorical = [column for column in df.columns if isinstance(df[column].dtype, pd.CategoricalDtype)]
+    return df.astype({column: 'string' for column in categorical})
+
+
+def fill_project_code(df):
+    """
+    New samples with their ProjectCode, 'ACBC' and the GroupLab initial (e.g., 'ACBCH' for Hawboldt).
+
+    Parameters:
+    - df (pandas.DataFrame): New samples with a GroupLab column.
+
+    Returns:
+    - pandas.DataFrame: The frame with ProjectCode filled in.
+    """
+    return df.assign(ProjectCode="ACBC" + df['GroupLab'].astype('string').str.strip().str[0])
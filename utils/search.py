@@ -0,0 +1,153 @@
+import streamlit as st
+import re
+import bisect
+import numpy as np
+import pandas as pd
+
+NUMBER = r'(\d+(?:\.\d+)?)'
+TEXT_COLUMNS = ['ShortName', 'LongName', 'Feedstock', 'Researcher/Student', 'GroupLab', 'PyrolysisType',
+                'ProcessDetails', 'Notes']
+
+# Query names of the numeric fields, parsed protocol columns first
+NUMERIC_FIELDS = {
+    'rate': 'HeatRate(deg/min)',
+    'peak': 'PeakTemp(C)',
+    'hold': 'Hold(min)',
+    'temp': 'Temp(C)',
+    'bet': 'BET(m2/g)',
+    'capacity': 'Capacity(mmol/g)',
+    'ph': 'pH',
+    'yield': 'Yield(%)',
+}
+OPERATORS = {'>': 'gt', '>=': 'ge', '<': 'lt', '<=': 'le', '=': 'eq', '==': 'eq'}
+COMPARISON = re.compile(r'^\s*(?P<field>[A-Za-z%]+)\s*(?P<op>>=|<=|==|>|<|=)\s*(?P<value>-?' + NUMBER[1:-1] + r')\s*\w*\s*$')
+
+
+def parse_process_details(details):
+    """
+    Split the ProcessDetails protocol text into typed columns, e.g.
+    "8 deg/min, 620 deg, 180 min | nat-cooling, room".
+
+    Parameters:
+    - details (pandas.Series): The ProcessDetails column.
+
+    Returns:
+    - pandas.DataFrame: HeatRate(deg/min), PeakTemp(C) and Hold(min) as nullable floats, and the
+      Cooling and CoolTo text after the '|'. Values the text doesn't give are missing.
+    """
+    text = details.astype('string')
+    heating = text.str.split('|', n=1).str[0]
+    cooling = text.str.split('|', n=1).str[1].str.split(',', n=1)
+    return pd.DataFrame({
+        'HeatRate(deg/min)': heating.str.extract(NUMBER + r'\s*deg\s*/\s*min', expand=False),
+        'PeakTemp(C)': heating.str.extract(NUMBER + r'\s*deg\b(?!\s*/)', expand=False),
+        'Hold(min)': heating.str.extract(NUMBER + r'\s*min\b', expand=False),
+    }, index=details.index).astype('Float64').assign(
+        Cooling=cooling.str[0].str.strip(),
+        CoolTo=cooling.str[1].str.strip(),
+    )
+
+
+def tokenize(text):
+    return re.findall(r'[a-z0-9%]+', text.lower())
+
+
+class SearchIndex:
+    """
+    Server-side search over the inventory.
+
+    Words are looked up in an inverted index (token -> row positions) over the descriptive
+    columns, prefixes included ("crab" finds "Crabshell"). Numeric conditions such as
+    "hold > 120 min" are answered by binary search in presorted columns, the protocol
+    fields coming from the parsed ProcessDetails.
+    """
+
+    def __init__(self, master):
+        self.master = master
+        self.process = parse_process_details(master['ProcessDetails'])
+        self.table = pd.concat([master, self.process], axis=1)
+        text = pd.Series('', index=master.index, dtype='string')
+        for column in TEXT_COLUMNS:
+            if column in master.columns:
+                text = text + ' ' + master[column].astype('string').fillna('')
+        # One (row position, token) pair per word, grouped by token
+        tokens = text.str.lower().str.findall(r'[a-z0-9%]+').set_axis(np.arange(len(master))).explode().dropna()
+        rows = tokens.index.to_numpy()
+        self.postings = {token: np.unique(rows[pairs]) for token, pairs in
+                         pd.Series(rows).groupby(tokens.to_numpy()).indices.items()}
+        self.tokens = sorted(self.postings)
+
+        self.sorted_fields = {}
+        for name, column in NUMERIC_FIELDS.items():
+            source = self.process if column in self.process.columns else master
+            if column not in source.columns:
+                continue
+            values = source[column].to_numpy(dtype=float, na_value=np.nan)
+            known = np.flatnonzero(~np.isnan(values))
+            order = known[np.argsort(values[known], kind='stable')]
+            self.sorted_fields[name] = (values[order], order)
+
+    def word(self, word):
+        """Row positions containing a token that starts with word."""
+        start = bisect.bisect_left(self.tokens, word)
+        stop = bisect.bisect_left(self.tokens, word + '\uffff')
+        found = [self.postings[token] for token in self.tokens[start:stop]]
+        return np.unique(np.concatenate(found)) if found else np.array([], dtype=int)
+
+    def compare(self, field, op, value):
+        """Row positions where a numeric field satisfies the comparison."""
+        values, order = self.sorted_fields[field]
+        bounds = {
+            'gt': (np.searchsorted(values, value, side='right'), len(values)),
+            'ge': (np.searchsorted(values, value, side='left'), len(values)),
+            'lt': (0, np.searchsorted(values, value, side='left')),
+            'le': (0, np.searchsorted(values, value, side='right')),
+            'eq': (np.searchsorted(values, value, side='left'), np.searchsorted(values, value, side='right')),
+        }[op]
+        return np.sort(order[bounds[0]:bounds[1]])
+
+    def term(self, term):
+        match = COMPARISON.match(term)
+        if match and match['field'].lower() in self.sorted_fields:
+            return self.compare(match['field'].lower(), OPERATORS[match['op']], float(match['value']))
+        selected = None
+        for word in tokenize(term):
+            positions = self.word(word)
+            selected = positions if selected is None else np.intersect1d(selected, positions)
+        return np.arange(len(self.master)) if selected is None else selected
+
+    def search(self, query):
+        """
+        Rows matching a query such as "hold > 120 min AND crab" or "slow OR bet >= 200".
+
+        Terms are words (every word must appear) or comparisons of a numeric field (rate, peak, hold,
+        temp, bet, capacity, ph, yield). AND binds tighter than OR.
+
+        Parameters:
+        - query (str): The query.
+
+        Returns:
+        - pandas.DataFrame: The matching rows of master with the parsed protocol columns, in inventory order.
+        """
+        selected = np.array([], dtype=int)
+        for alternative in re.split(r'\s+OR\s+', query.strip()):
+            positions = None
+            for term in re.split(r'\s+AND\s+', alternative):
+                found = self.term(term)
+                positions = found if positions is None else np.intersect1d(positions, found)
+            selected = np.union1d(selected, positions)
+        return self.table.iloc[selected]
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def search_index(master):
+    """
+    SearchIndex of a master inventory, built once per version (content hash) of master.
+
+    Parameters:
+    - master (pandas.DataFrame): The master inventory.
+
+    Returns:
+    - SearchIndex: The index.
+    """
+    return SearchIndex(master)
@@ -0,0 +1,108 @@
+import streamlit as st
+import re
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+# Feature -> patterns matching its column in master or in the UC Davis database
+FEATURES = {
+    'Temp(C)': [r'^temp', r'^htt', r'temperature'],
+    'BET(m2/g)': [r'^bet', r'surface\s*area'],
+    'pH': [r'^ph\b'],
+    '%C': [r'^%\s*c$', r'^c\s*\(', r'^carbon'],
+    '%H': [r'^%\s*h$', r'^h\s*\(', r'^hydrogen'],
+    '%N': [r'^%\s*n$', r'^n\s*\(', r'^nitrogen'],
+    '%O': [r'^%\s*o$', r'^o\s*\(', r'^oxygen'],
+    'PoreSize(nm)': [r'^pore\s*size', r'pore\s*diameter'],
+    'PoreVolume(cm3/g)': [r'^pore\s*vol'],
+}
+NAME_PATTERNS = [r'^shortname$', r'name', r'^sample', r'^id$']
+
+
+def find_column(columns, patterns):
+    for pattern in patterns:
+        for column in columns:
+            if re.search(pattern, str(column).strip(), flags=re.IGNORECASE):
+                return column
+    return None
+
+
+def feature_frame(df, source):
+    """
+    The similarity features of a dataset, matched by column name, as floats.
+
+    Parameters:
+    - df (pandas.DataFrame): master or the UC Davis database.
+    - source (str): Label of the dataset in the results.
+
+    Returns:
+    - pandas.DataFrame: source, name and one column per feature (NaN when the dataset lacks it).
+    """
+    name_column = find_column(df.columns, NAME_PATTERNS)
+    features = pd.DataFrame({'source': source,
+                             'name': df[name_column].astype(str) if name_column is not None
+                             else df.index.astype(str)}, index=df.index)
+    for feature, patterns in FEATURES.items():
+        column = feature if feature in df.columns else find_column(df.columns, patterns)
+        features[feature] = (pd.to_numeric(df[column], errors='coerce').astype(float) if column is not None
+                             else np.nan)
+    return features.reset_index(drop=True)
+
+
+class SimilarityIndex:
+    """
+    k-nearest-neighbour search over the numeric properties of master and the UC Davis database.
+
+    The features are imputed with their median and standardized over both datasets, then
+    put in a KD-tree, so a query is a tree lookup instead of a scan.
+    """
+
+    def __init__(self, master, ucd=None):
+        frames = [feature_frame(master, 'ACBC')]
+        if ucd is not None:
+            frames.append(feature_frame(ucd, 'UC Davis'))
+        self.samples = pd.concat(frames, ignore_index=True)
+        values = self.samples[list(FEATURES)].to_numpy(dtype=float)
+        self.known = ~np.isnan(values)
+        medians = np.nanmedian(np.where(self.known, values, np.nan), axis=0)
+        medians = np.where(np.isnan(medians), 0.0, medians)
+        values = np.where(self.known, values, medians)
+        spread = values.std(axis=0)
+        self.points = (values - values.mean(axis=0)) / np.where(spread > 0, spread, 1.0)
+        self.tree = cKDTree(self.points)
+        self.positions = {name: position for position, name in
+                          enumerate(self.samples['name']) if self.samples['source'].iat[position] == 'ACBC'}
+
+    def similar(self, short_name, k=10):
+        """
+        The k samples closest to a master sample, from both datasets.
+
+        Parameters:
+        - short_name (str): ShortName of the master sample.
+        - k (int): Number of neighbours. Default = 10
+
+        Returns:
+        - pandas.DataFrame: source, name, distance and the features of the neighbours, closest first.
+        """
+        position = self.positions[short_name]
+        distances, neighbours = self.tree.query(self.points[position], k=min(k + 1, len(self.points)))
+        keep = neighbours != position
+        result = self.samples.iloc[neighbours[keep][:k]].copy()
+        result.insert(2, 'distance', distances[keep][:k])
+        result['features known'] = self.known[neighbours[keep][:k]].sum(axis=1)
+        return result.reset_index(drop=True)
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def similarity_index(master, ucd=None):
+    """
+    SimilarityIndex of master and the UC Davis database, built once per version (content hash) of both.
+
+    Parameters:
+    - master (pandas.DataFrame): The master inventory.
+    - ucd (pandas.DataFrame): The UC Davis database. Default = None, search master only
+
+    Returns:
+    - SimilarityIndex: The index.
+    """
+    return SimilarityIndex(master, ucd)
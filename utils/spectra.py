@@ -0,0 +1,83 @@
+import numpy as np
+
+
+def minmax_downsample(x, y, n_out):
+    """
+    Shape-preserving downsampling of a spectrum by min/max bucketing.
+
+    The points are split in n_out // 2 buckets of consecutive samples and only the lowest and
+    the highest point of each bucket are kept, so peaks and valleys survive the reduction.
+
+    Parameters:
+    - x (array-like): X values, in acquisition order.
+    - y (array-like): Y values.
+    - n_out (int): Maximum number of points to return.
+
+    Returns:
+    - numpy.ndarray: Sorted indices of the points to keep.
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    n_buckets = max(n_out // 2, 1)
+    if n <= n_out:
+        return np.arange(n)
+
+    size = -(-n // n_buckets)  # ceil
+    padded = np.full(n_buckets * size, np.nan)
+    padded[:n] = y
+    buckets = padded.reshape(n_buckets, size)
+    # A bucket made only of NaN (padding or missing values) keeps its first point
+    all_nan = np.isnan(buckets).all(axis=1)
+    buckets[all_nan, 0] = 0.0
+    offsets = np.arange(n_buckets) * size
+    keep = np.concatenate([offsets + np.nanargmin(buckets, axis=1),
+                           offsets + np.nanargmax(buckets, axis=1),
+                           [0, n - 1]])
+    return np.unique(keep[keep < n])
+
+
+def downsample_frame(df, n_out, x_range=None):
+    """
+    Downsample a two-column spectrum frame, optionally restricted to an x range first.
+
+    Zooming into a range re-slices the full resolution data, so the visible part gets up to
+    n_out points of detail.
+
+    Parameters:
+    - df (pandas.DataFrame): Spectrum with x in the first column and y in the second.
+    - n_out (int): Maximum number of points to return.
+    - x_range (tuple): (low, high) x bounds to keep. Default = None, the whole spectrum
+
+    Returns:
+    - pandas.DataFrame: The kept rows, in their original order.
+    """
+    if x_range is not None:
+        x = df.iloc[:, 0].to_numpy(dtype=float)
+        df = df[(x >= x_range[0]) & (x <= x_range[1])]
+    return df.iloc[minmax_downsample(df.iloc[:, 0], df.iloc[:, 1], n_out)]
+
+
+def common_grid(spectra, n_points=None):
+    """
+    Resample several spectra onto one shared x grid.
+
+    The grid spans all the spectra; each one is linearly interpolated on it and is NaN
+    outside its own x range, so the rows can be compared or plotted column by column.
+
+    Parameters:
+    - spectra (list): (x, y) array pairs, in any x order.
+    - n_points (int): Size of the grid. Default = None, the length of the longest spectrum
+
+    Returns:
+    - numpy.ndarray: The x grid, shape (n_points,).
+    - numpy.ndarray: The resampled y values, shape (len(spectra), n_points).
+    """
+    spectra = [(np.asarray(x, dtype=float), np.asarray(y, dtype=float)) for x, y in spectra]
+    low = min(np.nanmin(x) for x, _ in spectra)
+    high = max(np.nanmax(x) for x, _ in spectra)
+    grid = np.linspace(low, high, n_points or max(len(x) for x, _ in spectra))
+    values = np.full((len(spectra), len(grid)), np.nan)
+    for row, (x, y) in enumerate(spectra):
+        order = np.argsort(x)
+        values[row] = np.interp(grid, x[order], y[order], left=np.nan, right=np.nan)
+    return grid, values
@@ -0,0 +1,108 @@
+import io
+import numpy as np
+import pandas as pd
+from utils.schema import INVENTORY_FIELDS, fill_project_code, normalize_columns
+
+CHUNK_ROWS = 500  # Spreadsheet rows read and validated at a time
+EXTENSIONS = ['csv', 'xlsx']
+
+
+def csv_chunks(content, chunk_rows=CHUNK_ROWS):
+    """Text chunks of a csv file, indexed by their spreadsheet row (the header is row 1)."""
+    reader = pd.read_csv(io.BytesIO(content), dtype='string', encoding='utf-8-sig',
+                         skip_blank_lines=False, chunksize=chunk_rows)
+    for chunk in reader:
+        chunk.index = chunk.index + 2
+        yield chunk
+
+
+def xlsx_chunks(content, chunk_rows=CHUNK_ROWS):
+    """
+    Chunks of the first sheet of a workbook, indexed by their spreadsheet row.
+
+    The workbook is opened read-only, so openpyxl streams the rows from the file
+    instead of building every cell of the sheet in memory.
+    """
+    from openpyxl import load_workbook
+    workbook = load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = [str(name) if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+        chunk, numbers = [], []
+        for number, row in enumerate(rows, start=2):
+            chunk.append(row[:len(header)])
+            numbers.append(number)
+            if len(chunk) == chunk_rows:
+                yield pd.DataFrame(chunk, columns=header, index=numbers, dtype=object)
+                chunk, numbers = [], []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header, index=numbers, dtype=object)
+    finally:
+        workbook.close()
+
+
+CHUNK_READERS = {'csv': csv_chunks, 'xlsx': xlsx_chunks}
+
+
+def tidy(chunk, columns):
+    """Chunk with the inventory's columns, blank rows dropped, text stripped and dates as YYYY-MM-DD."""
+    chunk = normalize_columns(chunk).reindex(columns=columns)
+    chunk = chunk.replace(r'^\s*$', np.nan, regex=True).dropna(how='all')
+    for column in chunk.columns:
+        # csv chunks are read as strings, xlsx cells keep their python types (only the str ones are stripped)
+        if pd.api.types.is_object_dtype(chunk[column]):
+            chunk[column] = chunk[column].map(lambda value: value.strip() if isinstance(value, str) else value)
+        elif pd.api.types.is_string_dtype(chunk[column]):
+            chunk[column] = chunk[column].str.strip()
+        if INVENTORY_FIELDS.get(column, {}).get('kind') == 'date':
+            dates = pd.to_datetime(chunk[column], errors='coerce')
+            chunk[column] = dates.dt.strftime('%Y-%m-%d').where(dates.notna(), chunk[column])
+    return chunk
+
+
+def import_spreadsheet(content, name, validator, columns, chunk_rows=CHUNK_ROWS):
+    """
+    Read and validate a spreadsheet of new samples chunk by chunk.
+
+    Each chunk is fitted to the inventory columns, given its ProjectCode like the form does
+    and checked by the validator; only the valid rows and the errors are kept. ShortNames
+    are also checked against the previous chunks of the same file.
+
+    Parameters:
+    - content (bytes): The csv or xlsx file.
+    - name (str): The file name, whose extension picks the reader.
+    - validator (InventoryValidator): The inventory rules and existing ShortNames.
+    - columns (list): Columns of the submitted rows, usually those of master.
+    - chunk_rows (int): Rows read and validated at a time. Default = CHUNK_ROWS
+
+    Returns:
+    - pandas.DataFrame: The valid rows, indexed by their spreadsheet row.
+    - pandas.DataFrame: row (spreadsheet row), ShortName, column and error of every problem.
+    - list: Columns of the file that are not in the inventory and were left out.
+    """
+    reader = CHUNK_READERS[name.rsplit('.', 1)[-1].lower()]
+    valid, errors, ignored, seen = [], [], [], set()
+    for chunk in reader(content, chunk_rows):
+        ignored += [column for column in normalize_columns(chunk).columns
+                    if column not in columns and column not in ignored and not column.startswith('Unnamed')]
+        chunk = tidy(chunk, columns)
+        if chunk.empty:
+            continue
+        chunk = fill_project_code(chunk)
+        found = validator.validate(chunk.reset_index(drop=True))
+        found['row'] = chunk.index.to_numpy()[found['row'].to_numpy()]
+        short_names = chunk['ShortName'].astype('string').str.strip()
+        repeated = short_names.isin(seen).to_numpy()
+        found = pd.concat([found, pd.DataFrame({
+            'row': chunk.index[repeated], 'ShortName': short_names[repeated].to_numpy(),
+            'column': 'ShortName', 'error': 'duplicated in the submission'})], ignore_index=True)
+        seen.update(short_names.dropna())
+        errors.append(found)
+        valid.append(chunk[~chunk.index.isin(found['row'])])
+    errors = pd.concat(errors, ignore_index=True).sort_values('row', kind='stable', ignore_index=True) if errors \
+        else pd.DataFrame(columns=['row', 'ShortName', 'column', 'error'])
+    valid = pd.concat(valid) if valid else pd.DataFrame(columns=columns)
+    return valid, errors, ignored
@@ -0,0 +1,145 @@
+import streamlit as st
+import re
+import numpy as np
+import pandas as pd
+from utils.schema import INVENTORY_FIELDS
+
+COLUMN_TYPES = {
+    'text': st.column_config.TextColumn,
+    'number': st.column_config.NumberColumn,
+    'date': st.column_config.DateColumn,
+    'select': st.column_config.SelectboxColumn,
+    'link': st.column_config.LinkColumn,
+}
+EDITOR_OPTIONS = ['help', 'max_chars', 'min_value', 'max_value', 'format', 'options', 'validate', 'required',
+                  'disabled']
+
+
+def column_config(edit=False, fields=INVENTORY_FIELDS):
+    """
+    st.data_editor column_config of the inventory, generated from the field rules.
+
+    Parameters:
+    - edit (bool): For editing existing samples, where the locked columns are read-only. Default = False
+    - fields (dict): Column -> entry rules. Default = INVENTORY_FIELDS
+
+    Returns:
+    - dict: Column name -> st.column_config column.
+    """
+    config = {}
+    for column, rules in fields.items():
+        options = {option: rules[option] for option in EDITOR_OPTIONS if option in rules}
+        if rules['kind'] == 'date':
+            options['step'] = 1
+        if edit and rules.get('locked'):
+            options['disabled'] = True
+        config[column] = COLUMN_TYPES[rules['kind']](**options)
+    return config
+
+
+def blank(values):
+    return values.isna() | values.astype('string').str.strip().eq('').fillna(True)
+
+
+class InventoryValidator:
+    """
+    Vectorized check of inventory rows against the field rules.
+
+    The regexes, option and naming key sets and the hash set of existing ShortNames are
+    prepared once, and every rule is then a single column operation, so thousands of
+    rows validate in milliseconds.
+    """
+
+    def __init__(self, existing_short_names=(), naming_keys=None, fields=INVENTORY_FIELDS):
+        self.fields = fields
+        self.existing = pd.Index(pd.Series(existing_short_names, dtype='string').dropna().str.strip().unique())
+        self.patterns = {column: re.compile(rules['pattern']) for column, rules in fields.items() if 'pattern' in rules}
+        self.naming = {}
+        for column, rules in fields.items():
+            for section, extract in rules.get('naming', {}).items():
+                if naming_keys is not None and section in naming_keys:
+                    keys = set(naming_keys[section]['Key'].astype(str))
+                    self.naming.setdefault(column, []).append((section, extract, keys))
+
+    def checks(self, df, ignore_existing=()):
+        """Yield (column, message, row mask) for every broken rule."""
+        for column, rules in self.fields.items():
+            if column not in df.columns or rules.get('disabled'):
+                continue
+            values = df[column]
+            missing = blank(values)
+            present = ~missing
+            if rules.get('required'):
+                yield column, 'required', missing.to_numpy()
+            if rules['kind'] in ('text', 'link', 'select'):
+                text = values.astype('string').str.strip()
+                if 'max_chars' in rules:
+                    yield column, f"longer than {rules['max_chars']} characters", \
+                        (present & (text.str.len() > rules['max_chars'])).fillna(False).to_numpy()
+                if 'options' in rules:
+                    yield column, f"not one of {', '.join(rules['options'])}", \
+                        (present & ~text.isin(rules['options'])).to_numpy()
+                if 'validate' in rules:
+                    yield column, f"doesn't match {rules['validate']}", \
+                        (present & ~text.str.contains(rules['validate'], regex=True).fillna(False)).to_numpy()
+                if column in self.patterns:
+                    yield column, f"doesn't follow {rules.get('help', rules['pattern'])}", \
+                        (present & ~text.str.fullmatch(self.patterns[column]).fillna(False)).to_numpy()
+                for section, extract, keys in self.naming.get(column, []):
+                    codes = text.str.extract(extract, expand=False)
+                    yield column, f"code not in the {section.replace('_', ' ')} naming keys", \
+                        (codes.notna() & ~codes.isin(keys)).fillna(False).to_numpy()
+                if rules.get('unique'):
+                    duplicated = present & text.duplicated(keep=False)
+                    yield column, 'duplicated in the submission', duplicated.fillna(False).to_numpy()
+                    taken = self.existing.difference(pd.Index(pd.Series(ignore_existing, dtype='string')))
+                    yield column, 'already in the inventory', (present & text.isin(taken)).to_numpy()
+            elif rules['kind'] == 'number':
+                numbers = pd.to_numeric(values, errors='coerce')
+                yield column, 'not a number', (present & numbers.isna()).to_numpy()
+                if 'min_value' in rules:
+                    yield column, f"below {rules['min_value']}", (numbers < rules['min_value']).fillna(False).to_numpy()
+                if 'max_value' in rules:
+                    yield column, f"above {rules['max_value']}", (numbers > rules['max_value']).fillna(False).to_numpy()
+            elif rules['kind'] == 'date':
+                dates = pd.to_datetime(values, errors='coerce')
+                yield column, 'not a date', (present & dates.isna()).to_numpy()
+                if 'min_value' in rules:
+                    yield column, f"before {rules['min_value']}", \
+                        (dates < pd.Timestamp(rules['min_value'])).fillna(False).to_numpy()
+
+    def validate(self, df, ignore_existing=()):
+        """
+        Every broken rule of every row.
+
+        Parameters:
+        - df (pandas.DataFrame): Rows to check, with the app's column names.
+        - ignore_existing (list): ShortNames that don't count as taken, e.g. the samples being edited. Default = ()
+
+        Returns:
+        - pandas.DataFrame: row (position in df), ShortName, column and error, one line per problem.
+        """
+        found = [(column, message, np.flatnonzero(mask)) for column, message, mask in self.checks(df, ignore_existing)]
+        rows = np.concatenate([positions for _, _, positions in found]) if found else np.array([], dtype=int)
+        errors = pd.DataFrame({
+            'row': rows,
+            'ShortName': df['ShortName'].to_numpy()[rows] if 'ShortName' in df.columns else pd.NA,
+            'column': np.repeat([column for column, _, _ in found], [len(p) for _, _, p in found]),
+            'error': np.repeat([message for _, message, _ in found], [len(p) for _, _, p in found]),
+        })
+        return errors.sort_values(['row', 'column'], kind='stable', ignore_index=True)
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def inventory_validator(master, naming_keys=None):
+    """
+    InventoryValidator knowing the ShortNames of master, built once per version of master.
+
+    Parameters:
+    - master (pandas.DataFrame): The master inventory.
+    - naming_keys (dict): naming_key.json sections as DataFrames (Key, Description). Default = None
+
+    Returns:
+    - InventoryValidator: The validator.
+    """
+    return InventoryValidator(master['ShortName'], naming_keys)